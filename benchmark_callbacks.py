@@ -0,0 +1,63 @@
+# 回调分发的微基准测试：比较不同回调配置下链条每一步的框架开销
+import timeit
+
+from smart_chain.callbacks import BaseCallbackHandler, CallbackManager
+from smart_chain.runnables import RunnableLambda, RunnableSequence
+
+# 链条步数
+STEPS = 10
+# 每种场景调用链条的次数
+NUMBER = 2000
+
+
+def add_one(x):
+    return x + 1
+
+
+# 接收 config 的函数不会被融合，用来测量逐步执行时的开销
+def add_one_with_config(x, config=None):
+    return x + 1
+
+
+# 只关心链结束事件的回调处理器
+class EndOnlyHandler(BaseCallbackHandler):
+    def __init__(self):
+        self.count = 0
+
+    def on_chain_end(self, outputs, **kwargs):
+        self.count += 1
+
+
+def build_chain(func):
+    return RunnableSequence([RunnableLambda(func) for _ in range(STEPS)])
+
+
+def per_step_us(chain, config=None):
+    """返回每一步的平均耗时（微秒）"""
+    seconds = timeit.timeit(lambda: chain.invoke(0, config=config), number=NUMBER)
+    return seconds / NUMBER / STEPS * 1e6
+
+
+def main():
+    fused_chain = build_chain(add_one)
+    step_chain = build_chain(add_one_with_config)
+    handler = EndOnlyHandler()
+    manager = CallbackManager([handler])
+
+    # 纯 Python 函数调用作为基线
+    baseline = timeit.timeit(lambda: [add_one(0) for _ in range(STEPS)], number=NUMBER)
+    print(f"纯函数调用:                  {baseline / NUMBER / STEPS * 1e6:.3f} us/step")
+    print(f"无回调（融合后）:            {per_step_us(fused_chain):.3f} us/step")
+    print(f"无回调（逐步执行）:          {per_step_us(step_chain):.3f} us/step")
+    print(
+        f"回调列表（每次解析）:        "
+        f"{per_step_us(step_chain, {'callbacks': [handler]}):.3f} us/step"
+    )
+    print(
+        f"预先创建的 CallbackManager:  "
+        f"{per_step_us(step_chain, {'callbacks': manager}):.3f} us/step"
+    )
+
+
+if __name__ == "__main__":
+    main()
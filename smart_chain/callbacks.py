@@ -1,4 +1,8 @@
+import threading
+import uuid
+import weakref
 from abc import ABC
+from collections import deque
 
 
 class BaseCallbackHandler(ABC):
@@ -76,3 +80,302 @@ class BaseCallbackHandler(ABC):
         """
         # 默认实现为空，子类可重写
         pass
+
+
+# CallbackManager 负责分发的事件名
+CALLBACK_HOOKS = (
+    "on_chain_start",
+    "on_chain_end",
+    "on_chain_error",
+    "on_llm_start",
+    "on_llm_end",
+    "on_llm_error",
+)
+
+# 缓存每个回调处理器类实际实现了哪些事件，每个类只解析一次
+_implemented_hooks_cache = {}
+
+
+# 找出回调处理器真正实现了的事件，继承自 BaseCallbackHandler 的空实现不计入
+def _get_implemented_hooks(handler):
+    handler_class = type(handler)
+    # 非 BaseCallbackHandler 子类的回调对象可能在实例上动态挂载方法，不做缓存
+    if not isinstance(handler, BaseCallbackHandler):
+        return [
+            name for name in CALLBACK_HOOKS if callable(getattr(handler, name, None))
+        ]
+    hooks = _implemented_hooks_cache.get(handler_class)
+    if hooks is None:
+        hooks = tuple(
+            name
+            for name in CALLBACK_HOOKS
+            if getattr(handler_class, name) is not getattr(BaseCallbackHandler, name)
+        )
+        _implemented_hooks_cache[handler_class] = hooks
+    return hooks
+
+
+class CallbackManager:
+    """
+    回调管理器
+
+    创建时预先解析每个处理器实现了哪些事件，分发时只调用真正实现了的方法；
+    没有任何处理器时 is_empty 为 True，调用方可以跳过 run_id 生成和事件参数构造。
+
+    示例:
+        python
+        manager = CallbackManager([MyHandler()])
+        # 直接放入 config，多次调用复用同一份解析结果
+        chain.invoke(input, config={"callbacks": manager})
+    """
+
+    def __init__(self, handlers=None):
+        """
+        初始化回调管理器
+        :param handlers: 回调处理器列表
+        """
+        self.handlers = list(handlers or [])
+        # 事件名 -> 需要调用的绑定方法列表
+        self._dispatch_table = {name: [] for name in CALLBACK_HOOKS}
+        for handler in self.handlers:
+            for name in _get_implemented_hooks(handler):
+                self._dispatch_table[name].append(getattr(handler, name))
+        # 没有任何需要调用的方法时走快速路径
+        self.is_empty = not any(self._dispatch_table.values())
+
+    @classmethod
+    def configure(cls, callbacks=None):
+        """
+        根据 config 中的 callbacks 得到回调管理器
+        :param callbacks: 回调处理器、处理器列表或 CallbackManager
+        :return: CallbackManager
+        """
+        if not callbacks:
+            return EMPTY_CALLBACK_MANAGER
+        if isinstance(callbacks, CallbackManager):
+            return callbacks
+        if not isinstance(callbacks, list):
+            callbacks = [callbacks]
+        return cls(callbacks)
+
+    # 依次调用实现了该事件的方法，回调出错不影响主流程
+    def _dispatch(self, name, *args, **kwargs):
+        for method in self._dispatch_table[name]:
+            try:
+                method(*args, **kwargs)
+            except Exception:
+                pass
+
+    def on_chain_start(self, serialized, inputs, run_id=None, **kwargs):
+        """
+        分发链开始事件
+        :param serialized: 序列化的链信息
+        :param inputs: 输入数据
+        :param run_id: 本次运行的 ID，为空且存在处理器时自动生成
+        :param kwargs: 其他关键字参数
+        :return: 本次运行的 run_id
+        """
+        if self.is_empty:
+            return run_id
+        # 只有真正需要上报事件时才生成 run_id
+        if run_id is None:
+            run_id = uuid.uuid4()
+        self._dispatch("on_chain_start", serialized, inputs, run_id=run_id, **kwargs)
+        return run_id
+
+    def on_chain_end(self, outputs, **kwargs):
+        """分发链结束事件"""
+        if self._dispatch_table["on_chain_end"]:
+            self._dispatch("on_chain_end", outputs=outputs, **kwargs)
+
+    def on_chain_error(self, error, **kwargs):
+        """分发链出错事件"""
+        if self._dispatch_table["on_chain_error"]:
+            self._dispatch("on_chain_error", error, **kwargs)
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        """分发 LLM 开始事件"""
+        if self._dispatch_table["on_llm_start"]:
+            self._dispatch("on_llm_start", serialized, prompts, **kwargs)
+
+    def on_llm_end(self, response, **kwargs):
+        """分发 LLM 结束事件"""
+        if self._dispatch_table["on_llm_end"]:
+            self._dispatch("on_llm_end", response, **kwargs)
+
+    def on_llm_error(self, error, **kwargs):
+        """分发 LLM 出错事件"""
+        if self._dispatch_table["on_llm_error"]:
+            self._dispatch("on_llm_error", error, **kwargs)
+
+    def __repr__(self):
+        return f"CallbackManager(handlers={self.handlers})"
+
+
+# 没有任何回调时共享的空管理器
+EMPTY_CALLBACK_MANAGER = CallbackManager()
+
+
+class _BackgroundWorker:
+    """
+    BackgroundCallbackHandler 的后台分发线程及其队列
+
+    不引用 BackgroundCallbackHandler 本身，处理器不再使用时可以被正常回收。
+    """
+
+    def __init__(self, manager, max_queue_size):
+        self.manager = manager
+        # deque 的 append/popleft 本身是线程安全的，计数器统一由 idle 条件变量保护
+        self.queue = deque()
+        # 剩余的队列空位
+        self.slots = threading.Semaphore(max_queue_size)
+        # 唤醒后台线程
+        self.wakeup = threading.Event()
+        # 已经入队但还没有分发完的事件数，入队时加一，分发结束后减一
+        self.pending = 0
+        # 因队列已满被丢弃的事件数
+        self.dropped = 0
+        self.idle = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(
+            target=self.run, name="BackgroundCallbackHandler", daemon=True
+        )
+        self.thread.start()
+
+    def put(self, event, block):
+        """
+        把事件放入队列
+        :param block: 队列已满时是否阻塞等待空位
+        :return: 队列已满且不阻塞时丢弃事件并返回 False
+        """
+        if block:
+            self.slots.acquire()
+        elif not self.slots.acquire(blocking=False):
+            with self.idle:
+                self.dropped += 1
+            return False
+        # 先计数再入队，flush 不会漏掉正在入队的事件
+        with self.idle:
+            self.pending += 1
+        self.queue.append(event)
+        self.wakeup.set()
+        return True
+
+    # 后台线程：不断取出事件并分发，队列为空时等待唤醒
+    def run(self):
+        while True:
+            try:
+                name, args, kwargs = self.queue.popleft()
+            except IndexError:
+                if self.closed:
+                    return
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            try:
+                self.manager._dispatch(name, *args, **kwargs)
+            finally:
+                self.slots.release()
+                with self.idle:
+                    self.pending -= 1
+                    if self.pending == 0:
+                        self.idle.notify_all()
+
+    def flush(self, timeout=None):
+        with self.idle:
+            return self.idle.wait_for(lambda: self.pending == 0, timeout)
+
+    def close(self, timeout=None):
+        if self.closed:
+            return
+        self.flush(timeout)
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join(timeout)
+
+
+class BackgroundCallbackHandler(BaseCallbackHandler):
+    """
+    后台回调处理器
+
+    包装一组较慢的回调处理器（写日志、上报指标等）。事件发生时只把事件放入有界队列，
+    由后台线程依次分发给被包装的处理器，处理器的耗时不再计入链条每一步的耗时。
+
+    示例:
+        python
+        handler = BackgroundCallbackHandler([MetricsHandler()], max_queue_size=1000)
+        chain.invoke(input, config={"callbacks": [handler]})
+        # 进程退出时会自动 flush，也可以手动调用
+        handler.flush()
+    """
+
+    def __init__(self, handlers, max_queue_size=1000, full_policy="drop"):
+        """
+        初始化后台回调处理器
+        :param handlers: 被包装的回调处理器或处理器列表
+        :param max_queue_size: 队列最多缓存的事件数
+        :param full_policy: 队列已满时的策略，"drop" 丢弃新事件，"block" 阻塞等待空位
+        """
+        if full_policy not in ("drop", "block"):
+            raise ValueError(f"不支持的队列满策略: {full_policy}")
+        if not isinstance(handlers, list):
+            handlers = [handlers]
+        self.manager = CallbackManager(handlers)
+        self.max_queue_size = max_queue_size
+        self.full_policy = full_policy
+        self._worker = _BackgroundWorker(self.manager, max_queue_size)
+        # 处理器被回收或进程退出时，把队列中剩余的事件分发完并结束后台线程；
+        # 后台线程只引用 _worker，不会让处理器一直存活
+        self._finalizer = weakref.finalize(self, self._worker.close)
+
+    # 把事件放入队列，被包装的处理器都没有实现该事件时直接忽略
+    def _enqueue(self, name, args, kwargs):
+        if self._worker.closed or not self.manager._dispatch_table[name]:
+            return
+        self._worker.put((name, args, kwargs), self.full_policy == "block")
+
+    @property
+    def dropped(self):
+        """因队列已满被丢弃的事件数"""
+        return self._worker.dropped
+
+    def flush(self, timeout=None):
+        """
+        等待队列中已有的事件全部分发完
+        :param timeout: 最长等待秒数，None 表示一直等待
+        :return: 是否在超时前分发完
+        """
+        return self._worker.flush(timeout)
+
+    def close(self, timeout=None):
+        """
+        停止接收新事件，分发完剩余事件后结束后台线程
+        :param timeout: 最长等待秒数，None 表示一直等待
+        """
+        # 已经关闭过时不再在进程退出时重复关闭
+        self._finalizer.detach()
+        self._worker.close(timeout)
+
+    def on_chain_start(self, serialized, inputs, **kwargs):
+        self._enqueue("on_chain_start", (serialized, inputs), kwargs)
+
+    def on_chain_end(self, outputs, **kwargs):
+        self._enqueue("on_chain_end", (), {"outputs": outputs, **kwargs})
+
+    def on_chain_error(self, error, **kwargs):
+        self._enqueue("on_chain_error", (error,), kwargs)
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._enqueue("on_llm_start", (serialized, prompts), kwargs)
+
+    def on_llm_end(self, response, **kwargs):
+        self._enqueue("on_llm_end", (response,), kwargs)
+
+    def on_llm_error(self, error, **kwargs):
+        self._enqueue("on_llm_error", (error,), kwargs)
+
+    def __repr__(self):
+        return (
+            f"BackgroundCallbackHandler(handlers={self.manager.handlers}, "
+            f"full_policy={self.full_policy!r})"
+        )
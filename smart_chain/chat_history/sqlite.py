@@ -15,7 +15,8 @@ class SQLChatMessageHistory(BaseChatMessageHistory):
 
     def _get_connection(self):
         if self._connection is None:
-            self._connection = sqlite3.connect(self.db_path)
+            # 异步调用会在线程池中读写历史，读和写可能落在不同线程上
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
         return self._connection
 
     def _ensure_table(self):
@@ -69,6 +70,27 @@ class SQLChatMessageHistory(BaseChatMessageHistory):
         )
         conn.commit()
 
+    # 批量添加消息：所有消息在同一个事务中插入，只提交一次
+    def add_messages(self, messages):
+        messages = list(messages)
+        for message in messages:
+            if not isinstance(message, BaseMessage):
+                raise TypeError(
+                    f"消息必须是 BaseMessage 实例，但得到了 {type(message)}"
+                )
+        if not messages:
+            return
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            f"""INSERT INTO {self.table_name}(session_id,role,content) VALUES(?,?,?)""",
+            [
+                (self.session_id, getattr(m, "type", None), getattr(m, "content", None))
+                for m in messages
+            ],
+        )
+        conn.commit()
+
     def _add_message_impl(self, message, expires_in=None):
         conn = self._get_connection()
         # 创建一个游标对象以执行SQL语句
@@ -8,11 +8,42 @@ from langchain_classic.chains.question_answering.map_reduce_prompt import messag
 # 从 .messages 模块导入 AIMessage、HumanMessage 和 SystemMessage 类
 from .messages import AIMessage, HumanMessage, SystemMessage
 from .prompts import ChatPromptValue
-from .runnables import RunnableConfigurableFields, RunnableConfigurableAlternatives
+from .runnables import (
+    Runnable,
+    RunnableConfigurableFields,
+    RunnableConfigurableAlternatives,
+)
+from .runnables.runnable import _aiter_in_executor
+from .config import (
+    ensure_config,
+    check_deadline,
+    get_remaining_time,
+    DeadlineExceededError,
+)
+
+
+# 发起 chat.completions.create 调用，config 中设置了截止时间时把剩余预算作为 HTTP 超时
+def _create_completion(client, params, config):
+    config = ensure_config(config)
+    # 预算已经用完或调用已被取消时不再发起请求
+    check_deadline(config)
+    remaining = get_remaining_time(config)
+    if remaining is None:
+        return client.chat.completions.create(**params)
+    # 调用方显式传入了更短的超时时间时以调用方为准
+    timeout = params.get("timeout")
+    if not isinstance(timeout, (int, float)) or timeout > remaining:
+        params = {**params, "timeout": remaining}
+    try:
+        return client.chat.completions.create(**params)
+    except openai.APITimeoutError as e:
+        if get_remaining_time(config) <= 0:
+            raise DeadlineExceededError("调用模型时超过了截止时间") from e
+        raise
 
 
 # 定义与OpenAI聊天交互的类
-class ChatOpenAI:
+class ChatOpenAI(Runnable):
     # 初始化方法
     def __init__(self, model: str = "gpt-4o", **kwargs):
         # 初始化 ChatOpenAI 类
@@ -34,11 +65,12 @@ class ChatOpenAI:
         self.client = openai.OpenAI(api_key=self.api_key)
 
     # 调用模型生成回复的方法
-    def invoke(self, input, **kwargs):
+    def invoke(self, input, config=None, **kwargs):
         # 调用模型生成回复
         """
         调用模型生成回复
         :param input: 输入内容，可以是字符串或消息列表
+        :param config: 可选的配置字典
         :param kwargs: 额外的 API 参数
         :return: AI 的回复消息
         """
@@ -52,7 +84,7 @@ class ChatOpenAI:
             **kwargs,
         }
         # 使用 OpenAI 客户端发起 chat.completions.create 调用获取回复
-        response = self.client.chat.completions.create(**params)
+        response = _create_completion(self.client, params, config)
         # 取出返回结果中的第一个选项
         choice = response.choices[0]
         # 获取消息内容
@@ -60,15 +92,17 @@ class ChatOpenAI:
         # 返回一个 AIMessage 对象
         return AIMessage(content=content)
 
-    def stream(self, input, **kwargs):
+    def stream(self, input, config=None, **kwargs):
         # 流式调用模型生成回复
         """
         流式调用模型生成回复
         :param input: 输入内容，可以是字符串或消息列表
+        :param config: 可选的配置字典
         :param kwargs: 额外的 API 参数
         Yields:
             AIMessage: AI 的回复消息块（每次产生部分内容）
         """
+        config = ensure_config(config)
         # 将输入数据转换为消息格式
         messages = self._convert_input(input)
         # 构建API请求参数字典，启用流式输出
@@ -80,9 +114,11 @@ class ChatOpenAI:
             **kwargs,
         }
         # 使用OpenAI 客户端发起流式调用
-        stream = self.client.chat.completions.create(**params)
+        stream = _create_completion(self.client, params, config)
         # 迭代流式响应
         for chunk in stream:
+            # 预算用完时停止读取剩余的分块
+            check_deadline(config)
             # 检查是否有内容增量
             if chunk.choices and len(chunk.choices) > 0:
                 delta = chunk.choices[0].delta
@@ -90,6 +126,20 @@ class ChatOpenAI:
                 if hasattr(delta, "content") and delta.content:
                     yield AIMessage(content=delta.content)
 
+    async def astream(self, input, config=None, **kwargs):
+        """
+        异步流式调用模型生成回复，底层 HTTP 流在线程池中逐块读取
+        :param input: 输入内容，可以是字符串或消息列表
+        :param config: 可选的配置字典
+        :param kwargs: 额外的 API 参数
+        Yields:
+            AIMessage: AI 的回复消息块
+        """
+        async for chunk in _aiter_in_executor(
+            self.stream(input, config=config, **kwargs)
+        ):
+            yield chunk
+
     # 内部方法，将输入转换为 OpenAI API 需要的消息格式
     def _convert_input(self, input):
         """
@@ -144,7 +194,7 @@ class ChatOpenAI:
 
 
 # 定义与 DeepSeek 聊天模型交互的类
-class ChatDeepSeek:
+class ChatDeepSeek(Runnable):
     # 初始化方法
     # model: 模型名称，默认为 "deepseek-chat"
     # **kwargs: 其他可选参数（如 temperature, max_tokens 等）
@@ -173,12 +223,13 @@ class ChatDeepSeek:
     # 调用模型生成回复的方法
     # input: 输入内容，可以是字符串或消息列表
     # **kwargs: 额外的 API 参数
-    def invoke(self, input, **kwargs):
+    def invoke(self, input, config=None, **kwargs):
         """
         调用模型生成回复
 
         Args:
             input: 输入内容，可以是字符串或消息列表
+            config: 可选的配置字典
             **kwargs: 额外的 API 参数
 
         Returns:
@@ -194,7 +245,7 @@ class ChatDeepSeek:
             **kwargs,
         }
         # 使用 OpenAI 兼容的客户端发起 chat.completions.create 调用获取回复
-        response = self.client.chat.completions.create(**params)
+        response = _create_completion(self.client, params, config)
         # 取出返回结果中的第一个选项
         choice = response.choices[0]
         # 获取消息内容
@@ -257,15 +308,17 @@ class ChatDeepSeek:
             # 其他输入类型，转为字符串作为 user 消息
             return [{"role": "user", "content": str(input)}]
 
-    def stream(self, input, **kwargs):
+    def stream(self, input, config=None, **kwargs):
         # 流式调用模型生成回复
         """
         流式调用模型生成回复
         :param input: 输入内容，可以是字符串或消息列表
+        :param config: 可选的配置字典
         :param kwargs: 额外的 API 参数
         Yields:
             AIMessage: AI 的回复消息块（每次产生部分内容）
         """
+        config = ensure_config(config)
         # 将输入数据转换为消息格式
         messages = self._convert_input(input)
         # 构建API请求参数字典，启用流式输出
@@ -277,9 +330,11 @@ class ChatDeepSeek:
             **kwargs,
         }
         # 使用OpenAI 客户端发起流式调用
-        stream = self.client.chat.completions.create(**params)
+        stream = _create_completion(self.client, params, config)
         # 迭代流式响应
         for chunk in stream:
+            # 预算用完时停止读取剩余的分块
+            check_deadline(config)
             # 检查是否有内容增量
             if chunk.choices and len(chunk.choices) > 0:
                 delta = chunk.choices[0].delta
@@ -287,6 +342,20 @@ class ChatDeepSeek:
                 if hasattr(delta, "content") and delta.content:
                     yield AIMessage(content=delta.content)
 
+    async def astream(self, input, config=None, **kwargs):
+        """
+        异步流式调用模型生成回复，底层 HTTP 流在线程池中逐块读取
+        :param input: 输入内容，可以是字符串或消息列表
+        :param config: 可选的配置字典
+        :param kwargs: 额外的 API 参数
+        Yields:
+            AIMessage: AI 的回复消息块
+        """
+        async for chunk in _aiter_in_executor(
+            self.stream(input, config=config, **kwargs)
+        ):
+            yield chunk
+
     # 定义可配置字段的方法，用于包装当前实例，支持部分参数运行时动态调整
     def configurable_fields(self, **fields):
         """
@@ -321,7 +390,8 @@ class ChatDeepSeek:
          配置可替代的 Runnable 选项，根据 config["configurable"] 动态切换
         :param selector_field:ConfigurableField，定义选择键的 id/name/description
         :param default_key:默认使用的分支 key（必须存在于 alternatives 中）
-        :param alternatives:runnable 或具有 invoke 方法的对象
+        :param alternatives:runnable 或具有 invoke 方法的对象，也可以是返回它们的无参工厂函数，
+                            工厂函数在第一次被选中时才调用，未被选中的模型不会创建客户端
         :return:
         """
         return RunnableConfigurableAlternatives(
@@ -332,7 +402,7 @@ class ChatDeepSeek:
 
 
 # 定义与通义千问（Tongyi）聊天模型交互的类
-class ChatTongyi:
+class ChatTongyi(Runnable):
 
     # 初始化方法
     # 初始化方法，设置模型名称和 API 相关参数
@@ -362,12 +432,13 @@ class ChatTongyi:
 
     # 调用模型生成回复的方法
     # 调用模型生成回复，返回 AIMessage 对象
-    def invoke(self, input, **kwargs):
+    def invoke(self, input, config=None, **kwargs):
         """
         调用模型生成回复
 
         Args:
             input: 输入内容，可以是字符串或消息列表
+            config: 可选的配置字典
             **kwargs: 额外的 API 参数
 
         Returns:
@@ -383,7 +454,7 @@ class ChatTongyi:
             **kwargs,
         }
         # 使用 OpenAI 兼容的客户端发起 chat.completions.create 调用以获取回复
-        response = self.client.chat.completions.create(**params)
+        response = _create_completion(self.client, params, config)
         # 取出返回结果中的第一个回复选项
         choice = response.choices[0]
         # 获取回复的消息内容，如果内容不存在则返回空字符串
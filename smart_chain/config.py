@@ -1,6 +1,12 @@
 """配置相关的类型定义和工具函数"""
 
+import asyncio
+import contextvars
 import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from typing import Union
 
 # 导入 uuid 库，主要用于 run_id 的唯一标识
@@ -17,6 +23,9 @@ import uuid
 #   - recursion_limit: int           # 最大递归层数限制
 #   - configurable: dict[str, Any]   # 可配置参数字典
 #   - run_id: uuid.UUID | None       # 唯一运行 ID
+#   - timeout: float | None          # 本次运行的时间预算（秒），ensure_config 时转换为 deadline
+#   - deadline: float | None         # 截止时间，time.monotonic() 时间戳，子步骤共享同一个截止时间
+#   - cancel_events: tuple[threading.Event, ...]  # 任意一个被置位后，子步骤在下次检查截止时间时停止
 # 默认的递归层数限制
 DEFAULT_RECURSION_LIMIT = 25
 
@@ -31,7 +40,95 @@ def ensure_config(config: Union[dict] = None):
     if config is None:
         return {}
     # 如果已经是 dict，则返回其副本，否则将其转为字典
-    return config.copy() if isinstance(config, dict) else dict(config)
+    config = config.copy() if isinstance(config, dict) else dict(config)
+    # 相对的 timeout 转换为绝对的 deadline，与已有的截止时间取较早者
+    timeout = config.pop("timeout", None)
+    if timeout is not None:
+        deadline = time.monotonic() + timeout
+        if config.get("deadline") is None or deadline < config["deadline"]:
+            config["deadline"] = deadline
+    return config
+
+
+class DeadlineExceededError(TimeoutError):
+    """运行时间超出了 config 中 timeout / deadline 设定的预算"""
+
+
+class RunCancelledError(DeadlineExceededError):
+    """运行被外部取消（例如对冲请求中落败的调用），按预算已用完处理，不会被重试"""
+
+
+def get_remaining_time(config):
+    """
+    计算距离截止时间还剩多少秒
+    :param config: 配置字典
+    :return: 剩余秒数（可能为负数），没有设置截止时间时返回 None
+    """
+    if not config:
+        return None
+    deadline = config.get("deadline")
+    if deadline is None:
+        return config.get("timeout")
+    return deadline - time.monotonic()
+
+
+def check_deadline(config):
+    """
+    检查是否已经超过截止时间，超过时抛出 DeadlineExceededError，
+    config 中的 cancel_events 被置位时抛出 RunCancelledError
+    :param config: 配置字典
+    """
+    if config and any(event.is_set() for event in config.get("cancel_events", ())):
+        raise RunCancelledError("运行已被取消")
+    remaining = get_remaining_time(config)
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceededError(f"已超过截止时间 {-remaining:.3f} 秒")
+
+
+async def wait_for_deadline(awaitable, config):
+    """
+    在剩余时间内等待协程完成，超时后取消它并抛出 DeadlineExceededError
+    :param awaitable: 要等待的协程
+    :param config: 配置字典
+    :return: 协程的返回值
+    """
+    remaining = get_remaining_time(config)
+    if remaining is None:
+        return await awaitable
+    if remaining <= 0:
+        # 协程不会被执行，关闭它以免出现未等待的警告
+        if inspect.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceededError(f"已超过截止时间 {-remaining:.3f} 秒")
+    try:
+        return await asyncio.wait_for(awaitable, remaining)
+    except DeadlineExceededError:
+        raise
+    except asyncio.TimeoutError as e:
+        # 子组件自己抛出的超时异常（例如 HTTP 超时）在预算未用完时原样抛出
+        if get_remaining_time(config) > 0:
+            raise
+        raise DeadlineExceededError(f"运行超过了剩余的 {remaining:.3f} 秒预算") from e
+
+
+def get_config_list(config, length: int):
+    """
+    把 config 展开为与输入等长的配置列表，供批量调用时每个输入单独使用
+    :param config: 单个配置字典，或与输入等长的配置字典列表
+    :param length: 输入的个数
+    :return: 配置字典列表
+    """
+    if isinstance(config, (list, tuple)):
+        if len(config) != length:
+            raise ValueError(
+                f"config 列表长度 {len(config)} 与输入个数 {length} 不一致"
+            )
+        return [ensure_config(c) for c in config]
+    config = ensure_config(config)
+    # 多个输入共享同一个 run_id 会让回调无法区分，批量时只保留给单个输入
+    if length > 1 and config.get("run_id") is not None:
+        config.pop("run_id")
+    return [config.copy() for _ in range(length)]
 
 
 def _accept_config(func):
@@ -61,3 +158,71 @@ def _merge_configs(*configs):
                 else:
                     result[key] = value
     return result
+
+
+async def run_in_executor(executor, func, *args, **kwargs):
+    """
+    在线程池中执行同步函数，并以协程的方式等待结果
+    :param executor: 线程池执行器，为 None 时使用事件循环的默认线程池
+    :param func: 要执行的同步函数
+    :param args: 位置参数
+    :param kwargs: 关键字参数
+    :return: 函数的返回值
+    """
+    # 获取当前正在运行的事件循环
+    loop = asyncio.get_running_loop()
+    # 复制当前上下文，保证 contextvars 在工作线程中依然可见
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, partial(context.run, func, *args, **kwargs)
+    )
+
+
+async def acquire_thread_lock(lock, poll_interval=0.001, max_poll_interval=0.05):
+    """
+    在不阻塞事件循环的情况下获取线程锁或线程信号量
+
+    只用非阻塞的 acquire 轮询，拿不到时 await asyncio.sleep 让出事件循环，
+    间隔从 poll_interval 开始翻倍，最多 max_poll_interval。
+    不占用线程池的线程，大量协程同时等待也不会占满默认执行器导致事件循环卡死；
+    协程被取消时也没有进行中的获取，不会泄漏锁。
+    :param lock: threading.Lock / threading.Semaphore 等带 acquire/release 的对象
+    :param poll_interval: 首次轮询间隔（秒）
+    :param max_poll_interval: 最大轮询间隔（秒）
+    """
+    delay = poll_interval
+    while not lock.acquire(blocking=False):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_poll_interval)
+
+
+@contextmanager
+def get_executor_for_config(config=None):
+    """
+    根据配置创建线程池执行器，线程数由 max_concurrency 决定
+    :param config: 可选的配置字典
+    :return: 上下文管理器，产出 ThreadPoolExecutor
+    """
+    config = config or {}
+    executor = ThreadPoolExecutor(max_workers=config.get("max_concurrency"))
+    try:
+        yield executor
+    except BaseException:
+        # 出错时不再等待尚未开始的任务，直接取消
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    else:
+        executor.shutdown(wait=True)
+
+
+def submit_in_context(executor, func, *args, **kwargs):
+    """
+    把函数提交到执行器，并携带当前的 contextvars 上下文
+    :param executor: 执行器
+    :param func: 要执行的函数
+    :param args: 位置参数
+    :param kwargs: 关键字参数
+    :return: Future 对象
+    """
+    context = contextvars.copy_context()
+    return executor.submit(context.run, func, *args, **kwargs)
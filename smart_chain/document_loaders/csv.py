@@ -83,6 +83,24 @@ class CSVLoader:
         # 返回 Document 列表
         return docs
 
+    # 逐行惰性加载 CSV 文件，内存占用与文件大小无关
+    def lazy_load(self):
+        """
+        惰性加载 CSV 文件，每次产出一行对应的 Document。
+        适合配合 Runnable.batch_iter 处理超大文件；
+        由于已产出的行无法回退，惰性加载不支持 autodetect_encoding。
+        Yields:
+            Document 对象
+        """
+        # 检查指定的文件路径是否存在
+        if not os.path.exists(self.file_path):
+            raise FileNotFoundError(f"文件不存在: {self.file_path}")
+        try:
+            with open(self.file_path, newline="", encoding=self.encoding) as csvfile:
+                yield from self._iter_rows(csvfile)
+        except UnicodeDecodeError as e:
+            raise RuntimeError(f"编码错误，无法读取文件 {self.file_path}") from e
+
     # 内部方法：读取 CSV 文件内容并生成每行的 Document
     def _read_file(self, csvfile):
         """
@@ -92,8 +110,17 @@ class CSVLoader:
         Returns:
             Document 对象列表
         """
-        # 初始化 Document 列表
-        docs = []
+        return list(self._iter_rows(csvfile))
+
+    # 内部方法：逐行读取 CSV 文件内容并产出 Document
+    def _iter_rows(self, csvfile):
+        """
+        从已打开的 CSV 文件中逐行读取数据并产出 Document 对象。
+        Args:
+            csvfile: 已打开的 CSV 文件对象
+        Yields:
+            Document 对象
+        """
         # 使用 DictReader 处理 csv，每行是一个字典
         csv_reader = csv.DictReader(csvfile, **self.csv_args)
         # 遍历每一行数据
@@ -139,7 +166,5 @@ class CSVLoader:
                 except KeyError:
                     # 元数据列不存在时报错
                     raise ValueError(f"元数据列 '{col}' 在 CSV 文件中不存在。")
-            # 创建 Document 对象并添加到文档列表
-            docs.append(Document(page_content=content, metadata=metadata))
-        # 返回所有生成的 Document 对象列表
-        return docs
+            # 创建 Document 对象并产出
+            yield Document(page_content=content, metadata=metadata)
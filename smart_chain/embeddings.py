@@ -1,15 +1,36 @@
 import os
 from openai import OpenAI
-from abc import ABC, abstractmethod
+from abc import abstractmethod
 from sentence_transformers import SentenceTransformer
 from langchain_huggingface import (
     HuggingFaceEmbeddings as LangchainHuggingfaceEmbeddings,
 )
 import requests
 
+from .runnables import Runnable
+
+
+# 定义抽象基类Embedding，同时也是一个 Runnable，可以直接作为链中的步骤
+class Embedding(Runnable):
+    # 作为 Runnable 调用时，嵌入单个文本
+    def invoke(self, input, config=None, **kwargs):
+        return self.embed_query(input)
+
+    # 批量调用时一次性嵌入所有文本，摊薄每次请求的开销
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        try:
+            return list(self.embed_documents(inputs))
+        except Exception:
+            if not return_exceptions:
+                raise
+            # 整批失败时退回逐条嵌入，找出具体出错的输入
+            return super().batch(
+                inputs, config=config, return_exceptions=True, **kwargs
+            )
 
-# 定义抽象基类Embedding
-class Embedding(ABC):
     # 定义抽象方法，嵌入单个查询文本
     @abstractmethod
     def embed_query(self, text):
@@ -1,3 +1,6 @@
+import copy
+
+
 # 定义基础消息类
 class BaseMessage:
     """
@@ -21,6 +24,18 @@ class BaseMessage:
     def __repr__(self):
         return f"{self.__class__.__name__}(content={self.content!r})"
 
+    def __add__(self, other):
+        """
+        拼接两个消息的内容，用于把流式输出的消息分块合并为完整消息
+        :param other: 另一个消息
+        :return: 与当前消息同类型的新消息
+        """
+        if not isinstance(other, BaseMessage):
+            return NotImplemented
+        merged = copy.copy(self)
+        merged.content = self.content + other.content
+        return merged
+
 # 定义用户消息类，继承自BaseMessage
 class HumanMessage(BaseMessage):
     """
@@ -1,15 +1,30 @@
-# 导入抽象类基类（ABC）和抽象方法（abstractmethod）
-from abc import ABC, abstractmethod
+# 导入抽象方法装饰器（abstractmethod）
+from abc import abstractmethod
 import json
 import re
 import pydantic
 
+from .messages import BaseMessage
 from .prompts import PromptTemplate
+from .runnables import Runnable
 
 
 # 定义输出解析器的抽象基类
-class BaseOutputParser(ABC):
-    """输出解析器的抽象基类"""
+class BaseOutputParser(Runnable):
+    """输出解析器的抽象基类，可以作为链中的一个步骤使用"""
+
+    # 作为 Runnable 调用时，消息对象先取出 content 再解析
+    def invoke(self, input, config=None, **kwargs):
+        """
+        解析上一步的输出
+        :param input: 字符串或消息对象
+        :param config: 可选的配置字典
+        :param kwargs: 额外的关键字参数
+        :return: 解析后的结果
+        """
+        if isinstance(input, BaseMessage):
+            input = input.content
+        return self.parse(input)
 
     # 定义抽象方法 parse，需要子类实现具体的解析逻辑
     @abstractmethod
@@ -53,6 +68,15 @@ class StrOutputParser(BaseOutputParser):
             return str(text)
         return text
 
+    # 流式转换：每收到一个分块就立即解析并产出，不等待完整输出
+    def transform(self, input_iterator, config=None, **kwargs):
+        for chunk in input_iterator:
+            yield self.invoke(chunk, config=config)
+
+    async def atransform(self, input_aiterator, config=None, **kwargs):
+        async for chunk in input_aiterator:
+            yield self.invoke(chunk, config=config)
+
     # 定义 __repr__ 方法，返回该解析器的字符串表示
     def __repr__(self):
         """返回解析器的字符串表示"""
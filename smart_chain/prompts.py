@@ -6,6 +6,7 @@ from langchain_classic.chains.qa_generation.prompt import templ
 
 # 导入消息类
 from .messages import SystemMessage,HumanMessage,AIMessage
+from .runnables import Runnable
 # 导入解析json模块
 import json
 # 导入路径分析模块
@@ -70,7 +71,7 @@ class PromptTemplate:
         return new_template
 
 # 定义用于处理多轮对话消息模板的类
-class ChatPromptTemplate:
+class ChatPromptTemplate(Runnable):
     # 聊天提示词模板类，用于创建多轮对话的提示词
     """聊天提示词模板类，用于创建多轮对话的提示词"""
     def __init__(self,messages):
@@ -105,7 +106,7 @@ class ChatPromptTemplate:
         # 返回所有变量名组成的列表
         return list(variables)
     # 根据输入变量格式化所有消息模板，返回ChatPromptValue对象
-    def invoke(self, input_variables):
+    def invoke(self, input_variables, config=None, **kwargs):
         # 对消息模板进行实际变量填充
         formatted_messages = self._format_all_messages(input_variables)
         # 封装成ChatPromptValue对象返回
@@ -8,4 +8,13 @@ from .configurable import (
     ConfigurableField,
     RunnableConfigurableAlternatives,
 )
-from .message_history import RunnableWithMessageHistory
+from .message_history import RunnableWithMessageHistory, SessionLocks
+from .compiler import CompiledPlan, RunnableFused
+from .cache import RunnableCache, BaseCache, InMemoryCache, SQLiteCache, DiskCache
+from .single_flight import RunnableSingleFlight
+from .circuit_breaker import CircuitBreaker, RetryBudget, CircuitOpenError
+from .fallbacks import RunnableWithFallbacks
+from .rate_limit import RateLimiter, RunnableRateLimited, get_rate_limiter
+from .router import RunnableRouter
+from .process_pool import get_process_pool, shutdown_process_pools
+from .graph import RunnableGraph, Graph, TimingReport, compile_graph
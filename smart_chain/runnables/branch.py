@@ -1,4 +1,6 @@
 from .runnable import Runnable
+from .router import _batch_grouped, _abatch_grouped
+from ..config import get_config_list
 
 
 class RunnableBranch(Runnable):
@@ -29,17 +31,79 @@ class RunnableBranch(Runnable):
         # 遍历所有的分支，遇到条件命中则执行对应的runnable
         for condition, runnable in self.branches:
             if condition(input, **kwargs):
-                return runnable.invoke(input, config=None, **kwargs)
+                return runnable.invoke(input, config=config, **kwargs)
         # 如果所有的分支条件都没有匹配上，则执行默认的default_branch
         if self.default_branch is not None:
-            return self.default_branch.invoke(input, config=None, **kwargs)
+            return self.default_branch.invoke(input, config=config, **kwargs)
         raise ValueError("未匹配到任何分支，也没有提供默认分支")
 
-    def batch(self, inputs: list, config=None, **kwargs):
-        return [self.invoke(input, config=None, **kwargs) for input in inputs]
+    async def ainvoke(self, input, config=None, **kwargs):
+        # 条件函数是同步的，直接判断；命中后 await 对应 runnable 的 ainvoke
+        for condition, runnable in self.branches:
+            if condition(input, **kwargs):
+                return await runnable.ainvoke(input, config=config, **kwargs)
+        if self.default_branch is not None:
+            return await self.default_branch.ainvoke(input, config=config, **kwargs)
+        raise ValueError("未匹配到任何分支，也没有提供默认分支")
+
+    # 选出第一个条件命中的分支，都未命中时返回默认分支
+    def _select_branch(self, input, **kwargs):
+        for condition, runnable in self.branches:
+            if condition(input, **kwargs):
+                return runnable
+        return self.default_branch
+
+    # 逐个选出分支，return_exceptions 时把条件函数抛出的异常放在对应位置
+    def _select_branches(self, inputs, return_exceptions, **kwargs):
+        targets = []
+        for input in inputs:
+            try:
+                targets.append(self._select_branch(input, **kwargs))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                targets.append(e)
+        return targets
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        """
+        批量调用：先为每个输入选出分支，再按分支分组，每个分支只调用一次 batch，
+        输出顺序与输入顺序一致
+        """
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        targets = self._select_branches(inputs, return_exceptions, **kwargs)
+        return _batch_grouped(
+            targets, inputs, configs, return_exceptions=return_exceptions, **kwargs
+        )
 
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        targets = self._select_branches(inputs, return_exceptions, **kwargs)
+        return await _abatch_grouped(
+            targets, inputs, configs, return_exceptions=return_exceptions, **kwargs
+        )
+
+    # 流式调用：选中分支后直接使用该分支的流式输出
     def stream(self, input, config=None, **kwargs):
-        yield from super().stream(input, config=None, **kwargs)
+        runnable = self._select_branch(input, **kwargs)
+        yield from runnable.stream(input, config=config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs):
+        runnable = self._select_branch(input, **kwargs)
+        async for chunk in runnable.astream(input, config=config, **kwargs):
+            yield chunk
+
+    def _streams_incrementally(self):
+        return all(
+            runnable._streams_incrementally()
+            for runnable in [*(r for _, r in self.branches), self.default_branch]
+        )
 
     def __repr__(self):
         parts = [
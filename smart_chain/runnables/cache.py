@@ -0,0 +1,551 @@
+"""运行结果缓存：为确定性的可运行对象提供带淘汰策略的记忆化层"""
+
+import copy
+import hashlib
+import json
+import marshal
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from .runnable import Runnable
+from ..config import ensure_config
+
+# 缓存未命中时 get 返回的哨兵对象，用于和缓存值 None 区分
+_MISSING = object()
+
+
+def _canonicalize(obj):
+    """
+    把输入转换为结构稳定、可 JSON 序列化的形式
+
+    字典按键排序，消息和提示词值按类型和字段展开，
+    保证同样内容的输入无论对象身份如何都得到相同的结果。
+    :param obj: 任意输入
+    :return: 可以 JSON 序列化的规范化结构
+    """
+    # 基础类型直接使用，JSON 本身就能区分 1、"1" 和 True
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if isinstance(obj, bytes):
+        return {"__bytes__": obj.hex()}
+    if isinstance(obj, dict):
+        # 键也规范化后再排序，避免依赖字典的插入顺序
+        items = [[_canonicalize(k), _canonicalize(v)] for k, v in obj.items()]
+        items.sort(key=lambda kv: json.dumps(kv[0], sort_keys=True))
+        return {"__dict__": items}
+    if isinstance(obj, list):
+        return [_canonicalize(item) for item in obj]
+    if isinstance(obj, tuple):
+        return {"__tuple__": [_canonicalize(item) for item in obj]}
+    if isinstance(obj, (set, frozenset)):
+        items = [_canonicalize(item) for item in obj]
+        items.sort(key=lambda item: json.dumps(item, sort_keys=True))
+        return {"__set__": items}
+    # ChatPromptValue 等聊天提示词值：按消息列表展开
+    # 这里用鸭子类型判断，避免引入 prompts 模块造成循环导入
+    if callable(getattr(obj, "to_messages", None)):
+        return {"__prompt__": _canonicalize(list(obj.to_messages()))}
+    # 消息对象：类名加上全部字段（content、type 以及额外参数）
+    if hasattr(obj, "content") and hasattr(obj, "type") and hasattr(obj, "__dict__"):
+        return {
+            "__message__": obj.__class__.__name__,
+            "fields": _canonicalize(vars(obj)),
+        }
+    # StringPromptValue 等只提供字符串形式的提示词值
+    if callable(getattr(obj, "to_string", None)):
+        return {"__prompt__": obj.to_string()}
+    # pydantic 模型
+    if callable(getattr(obj, "model_dump", None)):
+        return {
+            "__model__": obj.__class__.__name__,
+            "fields": _canonicalize(obj.model_dump()),
+        }
+    # 其他对象的 repr 可能包含内存地址，无法生成稳定的键
+    raise TypeError(f"无法为 {type(obj).__name__} 类型的输入生成缓存键")
+
+
+# 凭据类属性，任何 Runnable 都不把它们计入指纹
+_CREDENTIAL_FIELDS = frozenset(
+    {"api_key", "secret_key", "access_token", "password", "client"}
+)
+
+
+def _fingerprint(obj, depth=0):
+    """
+    计算可运行对象的结构指纹，用作默认的缓存命名空间
+
+    Runnable 按类型和公开属性递归展开，函数按模块、限定名、字节码和闭包变量展开，
+    同样定义的链条在不同进程中得到相同的结果，不同的函数即使同名也能区分。
+    其它对象只取类型名，避免把客户端连接等运行时状态带进指纹。
+    子类在 _fingerprint_exclude 中声明的计数器和 api_key 等凭据不参与计算，
+    否则命名空间会随流量变化，密钥也会间接写进缓存键。
+    :param obj: 任意对象
+    :param depth: 当前递归深度
+    :return: 可以 JSON 序列化的结构
+    """
+    if depth > 8:
+        return type(obj).__qualname__
+    if obj is None or isinstance(obj, (bool, int, float, str, bytes)):
+        return repr(obj)
+    if isinstance(obj, (list, tuple)):
+        return [_fingerprint(item, depth + 1) for item in obj]
+    if isinstance(obj, dict):
+        return sorted(
+            [repr(key), _fingerprint(value, depth + 1)] for key, value in obj.items()
+        )
+    code = getattr(obj, "__code__", None)
+    if code is not None:
+        try:
+            code_digest = hashlib.sha256(marshal.dumps(code)).hexdigest()
+        except ValueError:
+            code_digest = None
+        cells = [
+            _fingerprint(cell.cell_contents, depth + 1)
+            for cell in (getattr(obj, "__closure__", None) or ())
+            if cell.cell_contents is not obj
+        ]
+        return [
+            getattr(obj, "__module__", None),
+            getattr(obj, "__qualname__", None),
+            code_digest,
+            cells,
+        ]
+    if isinstance(obj, Runnable):
+        return [
+            type(obj).__module__ + "." + type(obj).__qualname__,
+            sorted(
+                [name, _fingerprint(value, depth + 1)]
+                for name, value in vars(obj).items()
+                if not name.startswith("_")
+                and name not in obj._fingerprint_exclude
+                and name not in _CREDENTIAL_FIELDS
+            ),
+        ]
+    return type(obj).__qualname__
+
+
+def runnable_namespace(runnable):
+    """
+    返回可运行对象的默认缓存命名空间
+    :param runnable: 被缓存的可运行对象
+    :return: 十六进制的 sha256 摘要前 16 位
+    """
+    text = json.dumps(_fingerprint(runnable), ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def make_cache_key(input, config=None, *, namespace=None, **kwargs):
+    """
+    根据输入和相关配置计算缓存键
+
+    配置中只有 configurable 会影响运行结果，tags、metadata、callbacks 等不参与计算。
+    :param input: 输入数据
+    :param config: 运行配置
+    :param namespace: 命名空间，区分共用同一个缓存后端的不同可运行对象
+    :param kwargs: 调用时的额外参数
+    :return: 十六进制的 sha256 摘要
+    """
+    configurable = (config or {}).get("configurable") or {}
+    payload = _canonicalize(
+        {
+            "namespace": namespace,
+            "input": input,
+            "configurable": configurable,
+            "kwargs": kwargs,
+        }
+    )
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BaseCache(ABC):
+    """
+    缓存后端基类
+
+    子类需要实现 get、set、clear 和 __len__，并保证线程安全。
+    """
+
+    @abstractmethod
+    def get(self, key):
+        """
+        读取缓存
+        :param key: 缓存键
+        :return: 缓存值，未命中或已过期时返回 _MISSING
+        """
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        """
+        写入缓存
+        :param key: 缓存键
+        :param value: 缓存值
+        :param ttl: 过期时间（秒），None 表示永不过期
+        """
+
+    @abstractmethod
+    def clear(self):
+        """清空缓存"""
+
+    @abstractmethod
+    def __len__(self):
+        """返回当前缓存条目数"""
+
+
+class InMemoryCache(BaseCache):
+    """
+    基于 OrderedDict 的内存 LRU 缓存
+
+    写入和读取时都做深拷贝，调用方修改返回值不会影响缓存中的条目，
+    与序列化存储的 SQLiteCache、DiskCache 行为一致。
+    """
+
+    def __init__(self, max_entries=1024):
+        """
+        初始化内存缓存
+        :param max_entries: 最大条目数，超出时淘汰最久未使用的条目，None 表示不限制
+        """
+        self.max_entries = max_entries
+        # 键 -> (过期时间, 值)，顺序即最近使用顺序
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            # 命中后移到末尾，标记为最近使用
+            self._data.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            # 超出容量时从头部淘汰最久未使用的条目
+            if self.max_entries is not None:
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache(BaseCache):
+    """基于 SQLite 的持久化缓存，值使用 pickle 序列化"""
+
+    def __init__(
+        self,
+        db_path=".smart_chain_cache.db",
+        table_name="runnable_cache",
+        max_entries=None,
+    ):
+        """
+        初始化 SQLite 缓存
+        :param db_path: 数据库文件路径，":memory:" 表示内存数据库
+        :param table_name: 缓存表名
+        :param max_entries: 最大条目数，超出时淘汰最久未访问的条目，None 表示不限制
+        """
+        self.db_path = db_path
+        self.table_name = table_name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 连接会在多个线程间共享，访问统一由锁保护
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table_name}(
+                   key TEXT PRIMARY KEY,
+                   value BLOB,
+                   expires_at REAL,
+                   accessed_at REAL
+                )
+            """)
+        self._connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_accessed_at "
+            f"ON {self.table_name}(accessed_at)"
+        )
+        self._connection.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT value, expires_at FROM {self.table_name} WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return _MISSING
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._connection.execute(
+                    f"DELETE FROM {self.table_name} WHERE key = ?", (key,)
+                )
+                self._connection.commit()
+                return _MISSING
+            # 更新访问时间，供 LRU 淘汰使用
+            self._connection.execute(
+                f"UPDATE {self.table_name} SET accessed_at = ? WHERE key = ?",
+                (now, key),
+            )
+            self._connection.commit()
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        data = pickle.dumps(value)
+        with self._lock:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.table_name}(key, value, expires_at, accessed_at) "
+                f"VALUES (?, ?, ?, ?)",
+                (key, data, expires_at, now),
+            )
+            if self.max_entries is not None:
+                # 只保留最近访问的 max_entries 条
+                self._connection.execute(
+                    f"""
+                        DELETE FROM {self.table_name} WHERE key NOT IN (
+                            SELECT key FROM {self.table_name}
+                            ORDER BY accessed_at DESC LIMIT ?
+                        )
+                    """,
+                    (self.max_entries,),
+                )
+            self._connection.commit()
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute(f"DELETE FROM {self.table_name}")
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                f"SELECT COUNT(*) FROM {self.table_name}"
+            ).fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._connection.close()
+
+
+class DiskCache(BaseCache):
+    """基于文件目录的缓存，每个条目一个 pickle 文件"""
+
+    def __init__(self, directory=".smart_chain_cache", max_entries=None):
+        """
+        初始化磁盘缓存
+        :param directory: 缓存目录，不存在时自动创建
+        :param max_entries: 最大条目数，超出时按文件修改时间淘汰最旧的条目，None 表示不限制
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _entries(self):
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".pkl")
+        ]
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at, value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return _MISSING
+        if expires_at is not None and expires_at <= time.time():
+            with self._lock:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            return _MISSING
+        # 刷新修改时间，供 LRU 淘汰使用
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        path = self._path(key)
+        # 先写临时文件再原子替换，避免并发读取到写了一半的文件
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((expires_at, value), f)
+        with self._lock:
+            os.replace(tmp_path, path)
+            if self.max_entries is not None:
+                entries = self._entries()
+                if len(entries) > self.max_entries:
+                    entries.sort(key=os.path.getmtime)
+                    for stale in entries[: len(entries) - self.max_entries]:
+                        try:
+                            os.remove(stale)
+                        except FileNotFoundError:
+                            pass
+
+    def clear(self):
+        with self._lock:
+            for path in self._entries():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def __len__(self):
+        return len(self._entries())
+
+
+class RunnableCache(Runnable):
+    """
+    带缓存的可运行对象
+
+    以输入和 configurable 配置的规范化哈希为键缓存 bound 的输出，
+    适合提示词格式化、temperature=0 的模型调用、输出解析等确定性步骤。
+    运行出错的结果不会被缓存；无法生成稳定键的输入直接透传给 bound。
+    缓存键包含命名空间，多个可运行对象可以安全地共用同一个缓存后端。
+    流式调用的分块列表和 invoke 的结果分开缓存，互不影响。
+    """
+
+    _fingerprint_exclude = frozenset({"hits", "misses", "uncacheable"})
+
+    def __init__(self, bound, backend=None, ttl=None, namespace=None):
+        """
+        初始化缓存包装
+        :param bound: 被包装的可运行对象
+        :param backend: 缓存后端，默认使用 InMemoryCache
+        :param ttl: 缓存条目的过期时间（秒），None 表示永不过期
+        :param namespace: 缓存命名空间，默认根据 bound 的结构指纹生成
+        """
+        self.bound = bound
+        self.backend = backend if backend is not None else InMemoryCache()
+        self.ttl = ttl
+        self.namespace = namespace or runnable_namespace(bound)
+        # 命中、未命中和无法缓存的次数
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self._stats_lock = threading.Lock()
+
+    def _lookup(self, input, config, kwargs, stream=False):
+        """
+        计算缓存键并查询缓存
+        :param stream: 是否查询流式调用缓存的分块列表
+        :return: (key, value)，key 为 None 表示输入无法缓存，value 为 _MISSING 表示未命中
+        """
+        namespace = f"{self.namespace}:stream" if stream else self.namespace
+        try:
+            key = make_cache_key(input, config, namespace=namespace, **kwargs)
+        except TypeError:
+            with self._stats_lock:
+                self.uncacheable += 1
+            return None, _MISSING
+        value = self.backend.get(key)
+        with self._stats_lock:
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, value
+
+    def invoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        key, value = self._lookup(input, config, kwargs)
+        if value is not _MISSING:
+            return value
+        output = self.bound.invoke(input, config, **kwargs)
+        if key is not None:
+            self.backend.set(key, output, ttl=self.ttl)
+        return output
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        key, value = self._lookup(input, config, kwargs)
+        if value is not _MISSING:
+            return value
+        output = await self.bound.ainvoke(input, config, **kwargs)
+        if key is not None:
+            self.backend.set(key, output, ttl=self.ttl)
+        return output
+
+    def stream(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        key, value = self._lookup(input, config, kwargs, stream=True)
+        # 命中时按原样重放缓存的分块
+        if value is not _MISSING:
+            yield from value
+            return
+        chunks = []
+        for chunk in self.bound.stream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        # 只有流完整结束才写入缓存，中途放弃或出错都不会缓存半截结果
+        if key is not None:
+            self.backend.set(key, chunks, ttl=self.ttl)
+
+    async def astream(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        key, value = self._lookup(input, config, kwargs, stream=True)
+        if value is not _MISSING:
+            for chunk in value:
+                yield chunk
+            return
+        chunks = []
+        async for chunk in self.bound.astream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        if key is not None:
+            self.backend.set(key, chunks, ttl=self.ttl)
+
+    def cache_info(self):
+        """
+        返回缓存统计信息
+        :return: 包含 hits、misses、uncacheable、hit_rate、size 的字典
+        """
+        with self._stats_lock:
+            hits, misses, uncacheable = self.hits, self.misses, self.uncacheable
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "uncacheable": uncacheable,
+            "hit_rate": hits / total if total else 0.0,
+            "size": len(self.backend),
+        }
+
+    def cache_clear(self):
+        """清空缓存并重置统计"""
+        self.backend.clear()
+        with self._stats_lock:
+            self.hits = self.misses = self.uncacheable = 0
+
+    def _streams_incrementally(self):
+        return self.bound._streams_incrementally()
+
+    def __repr__(self):
+        return f"RunnableCache(bound={self.bound!r}, backend={type(self.backend).__name__})"
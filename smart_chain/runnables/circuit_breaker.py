@@ -0,0 +1,275 @@
+"""熔断器与重试预算：在依赖服务故障时快速失败，避免重试风暴占满工作线程"""
+
+import threading
+import time
+from collections import deque
+
+# 熔断器的三种状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态时拒绝调用抛出的异常"""
+
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        # 距离熔断器允许探测还需要等待的秒数
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    - closed：正常放行，在最近 window_size 次调用中统计失败率，
+      调用数达到 minimum_calls 且失败率达到 failure_rate_threshold 时打开
+    - open：所有调用直接抛出 CircuitOpenError，经过 cooldown 秒后进入半开
+    - half_open：最多放行 half_open_max_calls 个探测调用，
+      全部成功则关闭，任意一个失败则重新打开
+
+    同一个实例可以被多个 Runnable 共享，所有方法都是线程安全的。
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold=0.5,
+        minimum_calls=10,
+        window_size=20,
+        cooldown=30.0,
+        half_open_max_calls=1,
+        name=None,
+    ):
+        """
+        初始化熔断器
+        :param failure_rate_threshold: 触发熔断的失败率（0~1）
+        :param minimum_calls: 统计窗口内至少有多少次调用才计算失败率
+        :param window_size: 统计最近多少次调用的结果
+        :param cooldown: 打开后等待多少秒进入半开状态
+        :param half_open_max_calls: 半开状态下允许的探测调用数
+        :param name: 熔断器名称，用于错误信息和指标
+        """
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.window_size = window_size
+        self.cooldown = cooldown
+        self.half_open_max_calls = half_open_max_calls
+        self.name = name or "circuit_breaker"
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        # 最近调用的结果，True 表示失败
+        self._window = deque(maxlen=window_size)
+        self._opened_at = None
+        # 半开状态下已放行和已成功的探测调用数
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # 每次进入半开状态加一，用来识别过期的探测凭据
+        self._half_open_epoch = 0
+        # 累计指标
+        self._successes = 0
+        self._failures = 0
+        self._rejected = 0
+        self._opened_count = 0
+
+    # 在持有锁的情况下检查冷却时间，到期则从 open 转为 half_open
+    def _refresh_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+            self._half_open_epoch += 1
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._opened_count += 1
+
+    def _failure_rate(self):
+        if not self._window:
+            return 0.0
+        return sum(self._window) / len(self._window)
+
+    @property
+    def state(self):
+        """当前状态：closed / open / half_open"""
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def before_call(self):
+        """
+        调用前检查是否放行，不放行时抛出 CircuitOpenError
+        :return: 放行的是半开状态的探测调用时返回探测凭据，调用没有结果时交给 release_probe；
+                 其它情况返回 None
+        """
+        with self._lock:
+            self._refresh_state()
+            if self._state == CLOSED:
+                return None
+            if (
+                self._state == HALF_OPEN
+                and self._probes_in_flight < self.half_open_max_calls
+            ):
+                self._probes_in_flight += 1
+                return self._half_open_epoch
+            self._rejected += 1
+            state = self._state
+            if state == OPEN:
+                retry_after = max(
+                    0.0, self.cooldown - (time.monotonic() - self._opened_at)
+                )
+            else:
+                retry_after = 0.0
+        raise CircuitOpenError(
+            f"熔断器 {self.name} 处于 {state} 状态，拒绝调用",
+            retry_after=retry_after,
+        )
+
+    def record_success(self):
+        """记录一次成功的调用"""
+        with self._lock:
+            self._successes += 1
+            if self._state == HALF_OPEN:
+                self._probe_successes += 1
+                # 所有探测都成功后关闭熔断器，并清空旧的统计窗口
+                if self._probe_successes >= self.half_open_max_calls:
+                    self._state = CLOSED
+                    self._window.clear()
+                return
+            self._window.append(False)
+
+    def record_failure(self):
+        """记录一次失败的调用"""
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN:
+                # 探测失败，重新打开
+                self._open()
+                return
+            self._window.append(True)
+            if (
+                self._state == CLOSED
+                and len(self._window) >= self.minimum_calls
+                and self._failure_rate() >= self.failure_rate_threshold
+            ):
+                self._open()
+
+    def release_probe(self, probe):
+        """
+        归还探测名额：探测调用被取消或中断、没有成功也没有失败时调用，
+        否则熔断器会一直停留在半开状态并拒绝所有调用
+        :param probe: before_call 返回的探测凭据
+        """
+        if probe is None:
+            return
+        with self._lock:
+            # 熔断器已经离开这一轮半开状态时，凭据已经过期
+            if (
+                self._state == HALF_OPEN
+                and self._half_open_epoch == probe
+                and self._probes_in_flight > 0
+            ):
+                self._probes_in_flight -= 1
+
+    def reset(self):
+        """手动把熔断器恢复为关闭状态"""
+        with self._lock:
+            self._state = CLOSED
+            self._window.clear()
+            self._opened_at = None
+
+    def metrics(self):
+        """
+        返回熔断器指标
+        :return: 包含状态、失败率和累计计数的字典
+        """
+        with self._lock:
+            self._refresh_state()
+            return {
+                "name": self.name,
+                "state": self._state,
+                "failure_rate": self._failure_rate(),
+                "window_calls": len(self._window),
+                "successes": self._successes,
+                "failures": self._failures,
+                "rejected": self._rejected,
+                "opened_count": self._opened_count,
+            }
+
+    def __repr__(self):
+        return f"CircuitBreaker(name={self.name!r}, state={self.state!r})"
+
+
+class RetryBudget:
+    """
+    重试预算
+
+    在最近 window 秒内，重试次数不能超过 min_retries 加上请求数乘以 ratio。
+    多个 RunnableRetry 共享同一个预算时，故障期间整个进程的重试总量被限制在
+    正常流量的固定比例之内，不会因为每个请求都重试而放大对下游的压力。
+    """
+
+    def __init__(self, ratio=0.2, min_retries=10, window=10.0):
+        """
+        初始化重试预算
+        :param ratio: 允许的重试次数与请求次数的比例
+        :param min_retries: 窗口内始终允许的最少重试次数，保证低流量时也能重试
+        :param window: 统计窗口的长度（秒）
+        """
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._lock = threading.Lock()
+        # 窗口内请求和重试的时间戳
+        self._requests = deque()
+        self._retries = deque()
+        self._exhausted = 0
+
+    def _prune(self, now):
+        cutoff = now - self.window
+        while self._requests and self._requests[0] < cutoff:
+            self._requests.popleft()
+        while self._retries and self._retries[0] < cutoff:
+            self._retries.popleft()
+
+    def record_request(self):
+        """记录一次首次请求"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_acquire_retry(self):
+        """
+        申请一次重试
+        :return: 预算充足时记录本次重试并返回 True，否则返回 False
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            allowed = self.min_retries + len(self._requests) * self.ratio
+            if len(self._retries) >= allowed:
+                self._exhausted += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def metrics(self):
+        """
+        返回重试预算指标
+        :return: 包含窗口内请求数、重试数和被拒绝重试次数的字典
+        """
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                "requests": len(self._requests),
+                "retries": len(self._retries),
+                "available": max(
+                    0.0,
+                    self.min_retries
+                    + len(self._requests) * self.ratio
+                    - len(self._retries),
+                ),
+                "exhausted": self._exhausted,
+            }
@@ -0,0 +1,137 @@
+"""链编译器：把嵌套的 RunnableSequence 展平，并融合相邻的纯函数步骤"""
+
+from .runnable import Runnable, RunnableSequence
+from .runnable_lambda import RunnableLambda, SYNC
+from .passthrough import RunnablePassthrough
+from ..config import check_deadline
+
+
+# 判断一个步骤是否可以与相邻步骤融合
+def _is_fusible(runnable):
+    # 只融合原生的 RunnableLambda，子类可能重写了调用逻辑
+    if type(runnable) is not RunnableLambda:
+        return False
+    # 只融合普通同步函数；协程、生成器和需要 config 的函数依赖框架的调用过程，不能融合
+    # 进程池模式的步骤需要保留自己的批量执行方式，也不融合
+    return (
+        runnable._kind == SYNC
+        and not runnable._accepts_config
+        and runnable.executor == "thread"
+    )
+
+
+# 递归展开嵌套的 RunnableSequence，得到扁平的步骤列表
+def _flatten(runnables):
+    steps = []
+    for runnable in runnables:
+        if isinstance(runnable, RunnableSequence):
+            steps.extend(_flatten(runnable.runnables))
+        else:
+            steps.append(runnable)
+    return steps
+
+
+class RunnableFused(Runnable):
+    """
+    融合后的步骤
+
+    把多个相邻的纯函数 RunnableLambda 合并为一次调用，
+    省去每一步的配置复制、run_id 生成和回调分发。
+    """
+
+    def __init__(self, lambdas):
+        """
+        初始化融合步骤
+        :param lambdas: 被融合的 RunnableLambda 列表
+        """
+        self.lambdas = list(lambdas)
+        # 预先取出所有函数，调用时直接依次执行
+        self.funcs = [r.func for r in self.lambdas]
+        self.name = "+".join(r.name for r in self.lambdas)
+
+    def invoke(self, input, config=None, **kwargs):
+        # 依次执行每个函数，上一个函数的输出作为下一个函数的输入
+        if not config or (
+            config.get("deadline") is None and not config.get("cancel_events")
+        ):
+            for func in self.funcs:
+                input = func(input, **kwargs)
+            return input
+        # 设置了截止时间或取消信号时，和逐步执行一样在每个函数之前检查
+        for func in self.funcs:
+            check_deadline(config)
+            input = func(input, **kwargs)
+        return input
+
+    def __repr__(self):
+        return f"RunnableFused({self.name})"
+
+
+class CompiledPlan:
+    """
+    编译后的执行计划
+
+    记录原始链条和展平、融合之后实际执行的步骤，便于查看编译效果。
+    """
+
+    def __init__(self, source, steps):
+        """
+        初始化执行计划
+        :param source: 被编译的 RunnableSequence
+        :param steps: 编译后的步骤列表
+        """
+        self.source = source
+        self.steps = steps
+
+    def describe(self):
+        """
+        返回执行计划的文字描述，每行一个步骤
+        :return: 描述字符串
+        """
+        lines = []
+        for idx, step in enumerate(self.steps):
+            if isinstance(step, RunnableFused):
+                members = ", ".join(repr(r) for r in step.lambdas)
+                lines.append(f"{idx}: fused[{members}]")
+            else:
+                lines.append(f"{idx}: {step!r}")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"CompiledPlan(steps={len(self.steps)})"
+
+
+def compile_sequence(sequence):
+    """
+    编译 RunnableSequence
+
+    1. 展平嵌套的 RunnableSequence
+    2. 去掉不改变数据的 RunnablePassthrough
+    3. 把相邻的纯函数 RunnableLambda 融合为一个 RunnableFused
+    :param sequence: 要编译的 RunnableSequence
+    :return: CompiledPlan
+    """
+    steps = []
+    # 等待融合的连续纯函数步骤
+    fusible = []
+
+    def _flush():
+        if len(fusible) == 1:
+            steps.append(fusible[0])
+        elif fusible:
+            steps.append(RunnableFused(fusible))
+        fusible.clear()
+
+    for runnable in _flatten(sequence.runnables):
+        if type(runnable) is RunnablePassthrough:
+            continue
+        if _is_fusible(runnable):
+            fusible.append(runnable)
+            continue
+        _flush()
+        steps.append(runnable)
+    _flush()
+    # 全部是透传步骤时保留一个，保证计划非空
+    if not steps:
+        steps.append(RunnablePassthrough())
+    return CompiledPlan(source=sequence, steps=steps)
@@ -1,6 +1,11 @@
-from ..config import ensure_config
-from collections import namedtuple
+import copy
+import threading
+from collections import OrderedDict, namedtuple
+
+from ..config import ensure_config, get_config_list
 from .runnable import Runnable
+from .runnable_lambda import RunnableLambda
+from .router import _batch_grouped, _abatch_grouped
 
 # id 字段的唯一标识 在config["configurable"]中使用
 # name 字段的显示名称 可选
@@ -14,10 +19,87 @@ ConfigurableField = namedtuple(
 )
 
 
+# 把字段更新转换为可以哈希的形式，作为实例缓存的键
+def _freeze(value):
+    if isinstance(value, dict):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+
 class RunnableConfigurableFields(Runnable):
-    def __init__(self, default, fields):
+    _fingerprint_exclude = frozenset({"hits", "misses"})
+
+    def __init__(self, default, fields, cache_size=32):
+        """
+        初始化可配置字段包装
+        :param default: 默认实例
+        :param fields: 字段名到 ConfigurableField 的字典
+        :param cache_size: 重新配置后的实例缓存的最大数量，0 表示不缓存
+        """
         self.default = default
         self.fields = fields
+        self.cache_size = cache_size
+        # 冻结后的字段更新 -> 重新配置的实例，顺序即最近使用顺序
+        # 相同配置的请求复用同一个实例，也就复用了它的客户端和 HTTP 连接池
+        self._instances = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # 使用本次的字段更新创建新的实例
+    def _build(self, updates):
+        # 获取默认实例的类型ChatOpenAI
+        default_class = type(self.default)
+        # 获取类型名
+        class_name = default_class.__name__
+        if class_name in ("ChatOpenAI", "ChatDeepSeek", "ChatTongyi"):
+            init_params = {"model": self.default.model}
+            if hasattr(self.default, "model_kwargs"):
+                init_params.update(self.default.model_kwargs.copy())
+            # 增加本次需要更新的参数
+            init_params.update(updates)
+            if hasattr(self.default, "api_key"):
+                init_params["api_key"] = self.default.api_key
+            if hasattr(self.default, "base_url"):
+                init_params["base_url"] = self.default.base_url
+            # 使用合并后的参数创建新的实例
+            return default_class(**init_params)
+        # 其它类型：复制默认实例后直接修改对应的属性
+        new_instance = copy.copy(self.default)
+        for field_name, value in updates.items():
+            setattr(new_instance, field_name, value)
+        return new_instance
+
+    # 从缓存中取出重新配置的实例，没有时创建并放入缓存
+    def _get_instance(self, updates):
+        try:
+            key = frozenset((k, _freeze(v)) for k, v in updates.items())
+            hash(key)
+        except TypeError:
+            # 无法哈希的字段值不缓存
+            return self._build(updates)
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is not None:
+                self._instances.move_to_end(key)
+                self.hits += 1
+                return instance
+            self.misses += 1
+        # 在锁外创建实例，避免阻塞其它配置的请求
+        instance = self._build(updates)
+        if self.cache_size <= 0:
+            return instance
+        with self._lock:
+            # 并发创建时以先放入缓存的实例为准
+            instance = self._instances.setdefault(key, instance)
+            self._instances.move_to_end(key)
+            while len(self._instances) > self.cache_size:
+                self._instances.popitem(last=False)
+        return instance
 
     def _prepare(self, config=None):
         # 规范化config字典
@@ -32,25 +114,33 @@ class RunnableConfigurableFields(Runnable):
                 config_value = configurable.get(field_spec.id)
                 if config_value is not None:
                     updates[field_name] = config_value
-        # 如果有更新内容，需要创建新的实例
-        if updates:
-            # 获取默认实例的类型ChatOpenAI
-            default_class = type(self.default)
-            # 获取类型名
-            class_name = default_class.__name__
-            if class_name in ("ChatOpenAI", "ChatDeepSeek", "ChatTongyi"):
-                init_params = {"model": self.default.model}
-                if hasattr(self.default, "model_kwargs"):
-                    init_params.update(self.default.model_kwargs.copy())
-                # 增加本次需要更新的参数
-                init_params.update(updates)
-                if hasattr(self.default, "api_key"):
-                    init_params["api_key"] = self.default.api_key
-                if hasattr(self.default, "base_url"):
-                    init_params["base_url"] = self.default.base_url
-                # 使用合并后的参数创建新的实例
-                new_instance = default_class(**init_params)
-                return new_instance, config
+        # 没有需要更新的字段时直接使用默认实例
+        if not updates:
+            return self.default, config
+        # 如果有更新内容，使用对应配置的实例
+        return self._get_instance(updates), config
+
+    def cache_info(self):
+        """
+        返回实例缓存的统计信息
+        :return: 包含 hits、misses、hit_rate、size、max_size 的字典
+        """
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._instances)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": size,
+            "max_size": self.cache_size,
+        }
+
+    def cache_clear(self):
+        """清空实例缓存并重置统计"""
+        with self._lock:
+            self._instances.clear()
+            self.hits = self.misses = 0
 
     def invoke(self, input, config=None, **kwargs):
         if config is None:
@@ -66,17 +156,55 @@ class RunnableConfigurableFields(Runnable):
 
 class RunnableConfigurableAlternatives(Runnable):
     def __init__(self, selector_field, default_key, alternatives):
+        """
+        初始化可替换分支
+        :param selector_field: ConfigurableField，config["configurable"] 中选择分支的字段
+        :param default_key: 默认使用的分支 key
+        :param alternatives: 分支 key 到备选项的字典；备选项可以是 Runnable、
+                             具有 invoke 方法的对象，或返回它们的无参工厂函数，
+                             工厂函数在第一次被选中时才调用，之后复用创建好的实例
+        """
         self.selector_field = selector_field
         self.default_key = default_key
         self.alternatives = alternatives
+        # 已经创建好的备选实例
+        self._instances = {}
+        self._lock = threading.Lock()
 
-    def _select(self, config=None):
-        config = ensure_config(config)
+    # 判断备选项是否为需要延迟创建的工厂函数
+    @staticmethod
+    def _is_factory(alternative):
+        # 类本身（例如 ChatTongyi）也视为工厂，选中时才实例化
+        if isinstance(alternative, type):
+            return True
+        return not hasattr(alternative, "invoke") and callable(alternative)
+
+    # 取出 key 对应的实例，工厂函数在第一次使用时创建
+    def _get_alternative(self, key):
+        alternative = self.alternatives[key]
+        if not self._is_factory(alternative):
+            return alternative
+        instance = self._instances.get(key)
+        if instance is None:
+            with self._lock:
+                # 加锁后再检查一次，保证每个工厂函数只调用一次
+                instance = self._instances.get(key)
+                if instance is None:
+                    instance = alternative()
+                    self._instances[key] = instance
+        return instance
+
+    # 根据配置确定分支 key
+    def _select_key(self, config):
         configurable = config.get("configurable", {})
         key = configurable.get(self.selector_field.id, self.default_key)
         if key not in self.alternatives:
             raise ValueError(f"未找到可用的分支")
-        return self.alternatives[key], config
+        return key
+
+    def _select(self, config=None):
+        config = ensure_config(config)
+        return self._get_alternative(self._select_key(config)), config
 
     def invoke(self, input, config=None, **kwargs):
         selected, merged_config = self._select(config)
@@ -85,3 +213,60 @@ class RunnableConfigurableAlternatives(Runnable):
         else:
             # 非runnable实例的话直接调用 初始参数已经生效
             return selected.invoke(input, **kwargs)
+
+    # 为每个输入的配置选出分支，选路失败且 return_exceptions 为 True 时对应位置放入异常
+    def _select_targets(self, configs, return_exceptions):
+        targets = []
+        # 同一个分支的包装只创建一次，保证分组时是同一个目标
+        wrapped = {}
+        for item_config in configs:
+            try:
+                key = self._select_key(item_config)
+                if key not in wrapped:
+                    selected = self._get_alternative(key)
+                    # 只有 invoke 方法的对象包装为 RunnableLambda，以便统一批量调用
+                    if not isinstance(selected, Runnable):
+                        selected = RunnableLambda(selected.invoke, name=str(key))
+                    wrapped[key] = selected
+                targets.append(wrapped[key])
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                targets.append(e)
+        return targets
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        """
+        批量调用：按选中的分支分组，每个分支只调用一次 batch，输出顺序与输入顺序一致
+        :param inputs: 输入值列表
+        :param config: 可选的配置字典，或与输入等长的配置字典列表
+        :param return_exceptions: 为 True 时单个输入出错不会中断整批
+        :param kwargs: 额外的关键字参数
+        :return: 输出值列表
+        """
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        targets = self._select_targets(configs, return_exceptions)
+        return _batch_grouped(
+            targets, inputs, configs, return_exceptions=return_exceptions, **kwargs
+        )
+
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        """
+        batch 的异步版本，各分支的 abatch 并发执行
+        :param inputs: 输入值列表
+        :param config: 可选的配置字典，或与输入等长的配置字典列表
+        :param return_exceptions: 为 True 时单个输入出错不会中断整批
+        :param kwargs: 额外的关键字参数
+        :return: 输出值列表
+        """
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        targets = self._select_targets(configs, return_exceptions)
+        return await _abatch_grouped(
+            targets, inputs, configs, return_exceptions=return_exceptions, **kwargs
+        )
@@ -0,0 +1,319 @@
+"""备用链：主 Runnable 出错或响应过慢时改用备用 Runnable"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .runnable import Runnable
+from ..config import ensure_config, submit_in_context
+
+
+class RunnableWithFallbacks(Runnable):
+    """
+        带备用方案的 Runnable
+
+        - 异常回退：主 Runnable 抛出 exceptions_to_handle 中的异常时，依次尝试备用 Runnable
+        - 对冲请求：设置 hedge_after 后，主 Runnable 超过指定延迟仍未返回，
+          就把同样的输入并行发给下一个备用 Runnable，先成功的结果胜出
+
+    落败的调用会收到取消信号：异步调用的任务直接被取消；同步调用在各自线程中执行，
+    无法从外部强行中断，只能置位其 config 中的 cancel_events，
+    它在下一次 check_deadline（链条步骤之间、流式分块之间、发起模型请求之前）时抛出 RunCancelledError 停止，
+    已经发出的单个 HTTP 请求仍会执行到返回或超时为止。
+
+        hedge_after 可以是秒数，也可以是 "p95"，表示使用主 Runnable 最近调用耗时的 95 分位数。
+        主 Runnable 输给备用 Runnable 时，把它已经耗费的时间作为真实耗时的下界计入样本，
+        否则慢调用永远不会进入样本，p95 会越来越小，对冲比例也会越来越高。
+    """
+
+    _fingerprint_exclude = frozenset({"hedged", "fallback_wins"})
+
+    def __init__(
+        self,
+        runnable,
+        fallbacks,
+        exceptions_to_handle=(Exception,),
+        hedge_after=None,
+        latency_window=100,
+        min_latency_samples=20,
+    ):
+        """
+        初始化备用链
+        :param runnable: 主 Runnable
+        :param fallbacks: 备用 Runnable 列表，按顺序尝试
+        :param exceptions_to_handle: 触发回退的异常类型
+        :param hedge_after: 对冲延迟，秒数或 "p95"，None 表示只在出错时回退
+        :param latency_window: 计算 p95 时保留的最近耗时样本数
+        :param min_latency_samples: 样本数达到多少之后才按 p95 对冲，之前只做异常回退
+        """
+        if isinstance(hedge_after, str) and hedge_after != "p95":
+            raise ValueError(f"不支持的 hedge_after: {hedge_after!r}")
+        self.runnable = runnable
+        self.fallbacks = list(fallbacks)
+        self.exceptions_to_handle = exceptions_to_handle
+        self.hedge_after = hedge_after
+        self.min_latency_samples = min_latency_samples
+        # 主 Runnable 最近调用的耗时，落败的调用按已耗费的时间计入
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        # 发起对冲请求的次数、由备用 Runnable 给出结果的次数
+        self.hedged = 0
+        self.fallback_wins = 0
+        # 同步对冲共用的线程池，首次对冲时创建
+        self._executor = None
+
+    @property
+    def runnables(self):
+        """主 Runnable 和所有备用 Runnable，按尝试顺序排列"""
+        return [self.runnable, *self.fallbacks]
+
+    def _record_latency(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _hedge_delay(self):
+        """
+        计算本次调用的对冲延迟
+        :return: 秒数，None 表示不对冲
+        """
+        if self.hedge_after != "p95":
+            return self.hedge_after
+        with self._lock:
+            samples = sorted(self._latencies)
+        # 样本不足时 p95 不可靠，暂不对冲
+        if len(samples) < self.min_latency_samples:
+            return None
+        return samples[math.ceil(len(samples) * 0.95) - 1]
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    thread_name_prefix="smart_chain-hedge"
+                )
+            return self._executor
+
+    @staticmethod
+    def _cancellable_config(config):
+        """
+        为一个候选调用复制配置，并附加它专属的取消信号
+        :param config: 本次调用的配置
+        :return: (子配置, threading.Event)
+        """
+        event = threading.Event()
+        child = config.copy()
+        child["cancel_events"] = (*config.get("cancel_events", ()), event)
+        return child, event
+
+    def _record_winner(self, index, hedged):
+        with self._lock:
+            if hedged:
+                self.hedged += 1
+            if index > 0:
+                self.fallback_wins += 1
+
+    def invoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        delay = self._hedge_delay()
+        if delay is None:
+            return self._invoke_sequential(input, config, **kwargs)
+        return self._invoke_hedged(input, config, delay, **kwargs)
+
+    # 依次尝试，前一个出错才尝试下一个
+    def _invoke_sequential(self, input, config, **kwargs):
+        first_error = None
+        for index, runnable in enumerate(self.runnables):
+            start = time.monotonic()
+            try:
+                output = runnable.invoke(input, config.copy(), **kwargs)
+            except self.exceptions_to_handle as e:
+                if first_error is None:
+                    first_error = e
+                continue
+            if index == 0:
+                self._record_latency(time.monotonic() - start)
+            self._record_winner(index, hedged=False)
+            return output
+        # 全部失败时抛出主 Runnable 的异常
+        raise first_error
+
+    # 对冲执行：超时或出错时启动下一个候选，谁先成功用谁
+    def _invoke_hedged(self, input, config, delay, **kwargs):
+        runnables = self.runnables
+        first_error = None
+        # future -> 候选下标
+        pending = {}
+        # future -> 候选的取消信号
+        cancel_events = {}
+        next_index = 0
+        hedged = False
+        start = time.monotonic()
+        executor = self._get_executor()
+
+        def _launch():
+            nonlocal next_index
+            runnable = runnables[next_index]
+            child_config, event = self._cancellable_config(config)
+            future = submit_in_context(
+                executor, runnable.invoke, input, child_config, **kwargs
+            )
+            pending[future] = next_index
+            cancel_events[future] = event
+            next_index += 1
+
+        try:
+            _launch()
+            while pending:
+                # 还有候选未启动时最多等待 delay 秒，否则一直等到有结果
+                timeout = delay if next_index < len(runnables) else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # 超过对冲延迟仍未返回，启动下一个候选
+                    hedged = True
+                    _launch()
+                    continue
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        output = future.result()
+                    except self.exceptions_to_handle as e:
+                        if first_error is None or index == 0:
+                            first_error = e
+                        continue
+                    # 主 Runnable 落败时仍在执行，已耗费的时间是它真实耗时的下界
+                    if index == 0 or 0 in pending.values():
+                        self._record_latency(time.monotonic() - start)
+                    self._record_winner(index, hedged)
+                    return output
+                # 有候选失败且没有其他调用在执行时，立即启动下一个
+                if not pending and next_index < len(runnables):
+                    _launch()
+            raise first_error
+        finally:
+            # 不等待落败的调用：尚未开始的直接取消，已经在执行的通过取消信号尽快停止
+            for future in pending:
+                future.cancel()
+                cancel_events[future].set()
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        delay = self._hedge_delay()
+        runnables = self.runnables
+        if delay is None:
+            first_error = None
+            for index, runnable in enumerate(runnables):
+                start = time.monotonic()
+                try:
+                    output = await runnable.ainvoke(input, config.copy(), **kwargs)
+                except self.exceptions_to_handle as e:
+                    if first_error is None:
+                        first_error = e
+                    continue
+                if index == 0:
+                    self._record_latency(time.monotonic() - start)
+                self._record_winner(index, hedged=False)
+                return output
+            raise first_error
+
+        first_error = None
+        # task -> 候选下标
+        pending = {}
+        # task -> 候选的取消信号，让候选放进线程池执行的同步部分也能停止
+        cancel_events = {}
+        next_index = 0
+        hedged = False
+        start = time.monotonic()
+
+        def _launch():
+            nonlocal next_index
+            runnable = runnables[next_index]
+            child_config, event = self._cancellable_config(config)
+            task = asyncio.ensure_future(
+                runnable.ainvoke(input, child_config, **kwargs)
+            )
+            pending[task] = next_index
+            cancel_events[task] = event
+            next_index += 1
+
+        try:
+            _launch()
+            while pending:
+                timeout = delay if next_index < len(runnables) else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    _launch()
+                    continue
+                for task in done:
+                    index = pending.pop(task)
+                    try:
+                        output = task.result()
+                    except self.exceptions_to_handle as e:
+                        if first_error is None or index == 0:
+                            first_error = e
+                        continue
+                    if index == 0 or 0 in pending.values():
+                        self._record_latency(time.monotonic() - start)
+                    self._record_winner(index, hedged)
+                    return output
+                if not pending and next_index < len(runnables):
+                    _launch()
+            raise first_error
+        finally:
+            # 取消落败的调用
+            for task in pending:
+                cancel_events[task].set()
+                task.cancel()
+
+    def stream(self, input, config=None, **kwargs):
+        """
+        流式调用：在产出第一个分块之前出错时回退到下一个 Runnable，
+        已经开始输出之后的错误直接抛出，避免把两个 Runnable 的输出拼在一起
+        """
+        config = ensure_config(config)
+        first_error = None
+        for runnable in self.runnables:
+            iterator = iter(runnable.stream(input, config.copy(), **kwargs))
+            try:
+                first = next(iterator)
+            except StopIteration:
+                return
+            except self.exceptions_to_handle as e:
+                if first_error is None:
+                    first_error = e
+                continue
+            yield first
+            yield from iterator
+            return
+        raise first_error
+
+    async def astream(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        first_error = None
+        for runnable in self.runnables:
+            iterator = runnable.astream(input, config.copy(), **kwargs).__aiter__()
+            try:
+                first = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            except self.exceptions_to_handle as e:
+                if first_error is None:
+                    first_error = e
+                continue
+            yield first
+            async for chunk in iterator:
+                yield chunk
+            return
+        raise first_error
+
+    def _streams_incrementally(self):
+        return all(runnable._streams_incrementally() for runnable in self.runnables)
+
+    def __repr__(self):
+        fallbacks = ", ".join(repr(r) for r in self.fallbacks)
+        return f"RunnableWithFallbacks(runnable={self.runnable!r}, fallbacks=[{fallbacks}])"
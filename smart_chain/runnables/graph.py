@@ -0,0 +1,420 @@
+"""依赖图调度：把组合好的链条编译成有向无环图，每个节点的依赖一完成就立即启动"""
+
+import asyncio
+import operator
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from .runnable import Runnable, RunnableSequence
+from .runnable_lambda import RunnableLambda
+from .parallel import RunnableParallel
+from .passthrough import RunnablePassthrough
+from ..config import (
+    check_deadline,
+    ensure_config,
+    get_executor_for_config,
+    submit_in_context,
+    wait_for_deadline,
+)
+
+# 图的输入和输出使用的虚拟节点编号
+INPUT = -1
+OUTPUT = -2
+
+# 图中的一个节点
+# id: 节点编号，按编译顺序从 0 开始
+# name: 节点名称
+# runnable: 节点执行的 Runnable
+# input_ref: 节点输入的引用，见 _resolve
+# deps: 依赖的节点编号，不包含 INPUT
+GraphNode = namedtuple("GraphNode", "id name runnable input_ref deps")
+
+# 一次调用中单个节点的耗时，时间都是相对调用开始的秒数
+# ready: 依赖全部完成的时间；start / end: 实际开始和结束执行的时间
+NodeTiming = namedtuple("NodeTiming", "id name deps ready start end")
+
+
+# 引用可以是节点编号（该节点的整个输出），也可以是 {键: 引用} 的字典，
+# 表示由多个节点的输出拼成的字典（RunnableParallel 的输出）
+def _resolve(ref, results):
+    if isinstance(ref, dict):
+        return {key: _resolve(value, results) for key, value in ref.items()}
+    return results[ref]
+
+
+# 收集引用中出现的所有节点编号
+def _ref_ids(ref, ids=None):
+    ids = set() if ids is None else ids
+    if isinstance(ref, dict):
+        for value in ref.values():
+            _ref_ids(value, ids)
+    else:
+        ids.add(ref)
+    return ids
+
+
+# 识别 RunnableLambda(operator.itemgetter(...))，返回取出的键列表
+def _picked_keys(runnable):
+    if type(runnable) is not RunnableLambda:
+        return None
+    if type(runnable.func) is not operator.itemgetter:
+        return None
+    return list(runnable.func.__reduce__()[1])
+
+
+def _node_name(runnable):
+    return getattr(runnable, "name", None) or type(runnable).__name__
+
+
+class _GraphBuilder:
+    """按数据流展开组合结构，生成节点列表"""
+
+    def __init__(self):
+        self.nodes = []
+
+    def _add(self, runnable, input_ref):
+        deps = tuple(sorted(_ref_ids(input_ref) - {INPUT}))
+        node = GraphNode(
+            len(self.nodes), _node_name(runnable), runnable, input_ref, deps
+        )
+        self.nodes.append(node)
+        return node.id
+
+    def build(self, runnable, ref):
+        """
+        :param runnable: 要展开的 Runnable
+        :param ref: 该 Runnable 的输入引用
+        :return: 该 Runnable 的输出引用
+        """
+        # 链条：依次展开每一步，上一步的输出引用作为下一步的输入引用
+        if isinstance(runnable, RunnableSequence):
+            for step in runnable.runnables:
+                ref = self.build(step, ref)
+            return ref
+        # 并行：每个分支各自展开，输出是 {键: 分支输出引用}，不需要额外的节点
+        if type(runnable) is RunnableParallel:
+            return {
+                name: self.build(branch, ref)
+                for name, branch in runnable.runnables.items()
+            }
+        if type(runnable) is RunnablePassthrough:
+            return ref
+        # 从字典中取键：只依赖被取出的键，不需要等待字典中的其它值
+        keys = _picked_keys(runnable)
+        if keys is not None and isinstance(ref, dict) and all(k in ref for k in keys):
+            if len(keys) == 1:
+                return ref[keys[0]]
+            ref = {key: ref[key] for key in keys}
+        # 其它 Runnable 作为一个整体成为图中的节点
+        return self._add(runnable, ref)
+
+
+class Graph:
+    """
+    依赖图的只读视图
+
+    nodes 是 GraphNode 列表，edges 是 (源节点编号, 目标节点编号) 列表，
+    图的输入和输出分别用 INPUT 和 OUTPUT 表示。
+    """
+
+    def __init__(self, nodes, output_ref):
+        self.nodes = list(nodes)
+        self.output_ref = output_ref
+        edges = []
+        for node in self.nodes:
+            for dep in sorted(_ref_ids(node.input_ref)):
+                edges.append((dep, node.id))
+        for dep in sorted(_ref_ids(output_ref)):
+            edges.append((dep, OUTPUT))
+        self.edges = edges
+
+    def _label(self, node_id):
+        if node_id == INPUT:
+            return "input"
+        if node_id == OUTPUT:
+            return "output"
+        return f"{node_id}:{self.nodes[node_id].name}"
+
+    def describe(self):
+        """
+        返回图的文字描述，每行一个节点及其依赖
+        :return: 描述字符串
+        """
+        lines = []
+        for node in self.nodes:
+            deps = ", ".join(self._label(d) for d in sorted(_ref_ids(node.input_ref)))
+            lines.append(f"{self._label(node.id)} <- {deps}")
+        deps = ", ".join(self._label(d) for d in sorted(_ref_ids(self.output_ref)))
+        lines.append(f"output <- {deps}")
+        return "\n".join(lines)
+
+    def to_mermaid(self):
+        """
+        生成 Mermaid 流程图文本
+        :return: Mermaid 字符串
+        """
+
+        def _id(node_id):
+            return {INPUT: "input", OUTPUT: "output"}.get(node_id, f"n{node_id}")
+
+        lines = ["graph TD", "    input([input])", "    output([output])"]
+        for node in self.nodes:
+            lines.append(f'    n{node.id}["{node.name}"]')
+        for source, target in self.edges:
+            lines.append(f"    {_id(source)} --> {_id(target)}")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"Graph(nodes={len(self.nodes)}, edges={len(self.edges)})"
+
+
+class TimingReport:
+    """一次图调用中每个节点的耗时报告"""
+
+    def __init__(self, timings, total):
+        """
+        :param timings: NodeTiming 列表，按节点编号排列
+        :param total: 整次调用的耗时（秒）
+        """
+        self.timings = timings
+        self.total = total
+
+    @property
+    def busy(self):
+        """所有节点执行时间之和"""
+        return sum(t.end - t.start for t in self.timings)
+
+    def critical_path(self):
+        """
+        关键路径：从最后结束的节点出发，每次回溯到最晚结束的依赖
+        :return: 节点名称列表，按执行顺序排列
+        """
+        if not self.timings:
+            return []
+        by_id = {t.id: t for t in self.timings}
+        current = max(self.timings, key=lambda t: t.end)
+        path = [current.name]
+        while current.deps:
+            current = max((by_id[d] for d in current.deps), key=lambda t: t.end)
+            path.append(current.name)
+        return path[::-1]
+
+    def describe(self):
+        """
+        返回耗时报告的表格文本，时间单位为毫秒
+        :return: 报告字符串
+        """
+        lines = [f"{'node':<24}{'wait':>10}{'start':>10}{'duration':>10}"]
+        for t in self.timings:
+            lines.append(
+                f"{f'{t.id}:{t.name}':<24}"
+                f"{(t.start - t.ready) * 1000:>10.1f}"
+                f"{t.start * 1000:>10.1f}"
+                f"{(t.end - t.start) * 1000:>10.1f}"
+            )
+        parallelism = self.busy / self.total if self.total else 0.0
+        lines.append(
+            f"total {self.total * 1000:.1f}ms, busy {self.busy * 1000:.1f}ms, "
+            f"parallelism {parallelism:.2f}"
+        )
+        lines.append("critical path: " + " -> ".join(self.critical_path()))
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"TimingReport(nodes={len(self.timings)}, total={self.total:.3f}s)"
+
+
+class RunnableGraph(Runnable):
+    """
+    按依赖图调度执行的 Runnable
+
+    把 RunnableSequence / RunnableParallel 的嵌套结构展开为节点，节点之间只保留真实的数据依赖：
+    并行分支的输出按键拆开，后续步骤用 itemgetter 取键时只依赖对应的分支。
+    调度时每个节点的依赖一完成就立即启动，不同嵌套层级中互不依赖的节点可以重叠执行，
+    例如加载历史、检索和改写问题。
+
+    需要节点耗时时调用 invoke_with_report / ainvoke_with_report，报告随本次调用返回，
+    不保存在实例上，并发调用之间互不覆盖。
+    """
+
+    def __init__(self, source):
+        """
+        编译依赖图
+        :param source: 要编译的 Runnable，通常是 RunnableSequence 或 RunnableParallel
+        """
+        self.source = source
+        builder = _GraphBuilder()
+        self.output_ref = builder.build(source, INPUT)
+        self.nodes = builder.nodes
+        # 节点编号 -> 依赖它的节点编号列表
+        self._dependents = {node.id: [] for node in self.nodes}
+        for node in self.nodes:
+            for dep in node.deps:
+                self._dependents[dep].append(node.id)
+
+    def get_graph(self):
+        """
+        返回依赖图
+        :return: Graph
+        """
+        return Graph(self.nodes, self.output_ref)
+
+    # 子节点使用的配置：去掉本次调用的 run_id，避免所有节点共用同一个 run_id
+    @staticmethod
+    def _child_config(config):
+        if "run_id" not in config:
+            return config
+        return {k: v for k, v in config.items() if k != "run_id"}
+
+    # 在工作线程中执行单个节点，返回输出和实际的开始、结束时间
+    @staticmethod
+    def _run_node(node, value, config, **kwargs):
+        start = time.monotonic()
+        output = node.runnable.invoke(value, config=config.copy(), **kwargs)
+        return output, start, time.monotonic()
+
+    def _build_report(self, started_at, ready, spans):
+        timings = [
+            NodeTiming(
+                node.id,
+                node.name,
+                node.deps,
+                ready[node.id] - started_at,
+                spans[node.id][0] - started_at,
+                spans[node.id][1] - started_at,
+            )
+            for node in self.nodes
+        ]
+        return TimingReport(timings, time.monotonic() - started_at)
+
+    def invoke(self, input, config=None, **kwargs):
+        return self.invoke_with_report(input, config, **kwargs)[0]
+
+    def invoke_with_report(self, input, config=None, **kwargs):
+        """
+        调用并返回本次调用的节点耗时报告
+        :param input: 输入值
+        :param config: 可选的配置字典
+        :return: (输出, TimingReport)
+        """
+        config = ensure_config(config)
+        child_config = self._child_config(config)
+        results = {INPUT: input}
+        # 每个节点尚未完成的依赖数
+        remaining = {node.id: len(node.deps) for node in self.nodes}
+        ready = {}
+        spans = {}
+        started_at = time.monotonic()
+        with get_executor_for_config(config) as executor:
+            running = {}
+
+            def _submit(node):
+                # 预算已经用完时不再启动新的节点
+                check_deadline(config)
+                ready[node.id] = time.monotonic()
+                value = _resolve(node.input_ref, results)
+                future = submit_in_context(
+                    executor, self._run_node, node, value, child_config, **kwargs
+                )
+                running[future] = node
+
+            try:
+                for node in self.nodes:
+                    if not node.deps:
+                        _submit(node)
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node = running.pop(future)
+                        results[node.id], start, end = future.result()
+                        spans[node.id] = (start, end)
+                        # 依赖全部完成的后继节点立即启动
+                        for dependent in self._dependents[node.id]:
+                            remaining[dependent] -= 1
+                            if remaining[dependent] == 0:
+                                _submit(self.nodes[dependent])
+            finally:
+                # 出错时取消尚未开始的节点
+                for future in running:
+                    future.cancel()
+        report = self._build_report(started_at, ready, spans)
+        return _resolve(self.output_ref, results), report
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return (await self.ainvoke_with_report(input, config, **kwargs))[0]
+
+    async def ainvoke_with_report(self, input, config=None, **kwargs):
+        """
+        invoke_with_report 的异步版本
+        :param input: 输入值
+        :param config: 可选的配置字典
+        :return: (输出, TimingReport)
+        """
+        config = ensure_config(config)
+        child_config = self._child_config(config)
+        max_concurrency = config.get("max_concurrency")
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        results = {INPUT: input}
+        remaining = {node.id: len(node.deps) for node in self.nodes}
+        ready = {}
+        spans = {}
+        started_at = time.monotonic()
+
+        async def _run_node(node, value):
+            if semaphore is not None:
+                await semaphore.acquire()
+            try:
+                start = time.monotonic()
+                # 节点只能使用剩余的预算，超时后会被取消
+                output = await wait_for_deadline(
+                    node.runnable.ainvoke(value, config=child_config.copy(), **kwargs),
+                    config,
+                )
+                return output, start, time.monotonic()
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+
+        running = {}
+
+        def _submit(node):
+            check_deadline(config)
+            ready[node.id] = time.monotonic()
+            value = _resolve(node.input_ref, results)
+            running[asyncio.ensure_future(_run_node(node, value))] = node
+
+        try:
+            for node in self.nodes:
+                if not node.deps:
+                    _submit(node)
+            while running:
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    node = running.pop(task)
+                    results[node.id], start, end = task.result()
+                    spans[node.id] = (start, end)
+                    for dependent in self._dependents[node.id]:
+                        remaining[dependent] -= 1
+                        if remaining[dependent] == 0:
+                            _submit(self.nodes[dependent])
+        finally:
+            # 出现异常或外部取消时，取消仍在运行的节点
+            for task in running:
+                task.cancel()
+        report = self._build_report(started_at, ready, spans)
+        return _resolve(self.output_ref, results), report
+
+    def __repr__(self):
+        return f"RunnableGraph(nodes={len(self.nodes)}, source={self.source!r})"
+
+
+def compile_graph(runnable):
+    """
+    把组合好的 Runnable 编译为按依赖调度的 RunnableGraph
+    :param runnable: 要编译的 Runnable
+    :return: RunnableGraph
+    """
+    return RunnableGraph(runnable)
@@ -1,11 +1,97 @@
-from requests import session
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
 
 from ..messages import HumanMessage, AIMessage
-from .runnable import Runnable
-from ..config import ensure_config
+from .runnable import Runnable, _add_chunks
+from ..config import (
+    ensure_config,
+    run_in_executor,
+    get_config_list,
+    acquire_thread_lock,
+)
 from ..chat_history import InMemoryChatMessageHistory
 
 
+class SessionLocks:
+    """
+    按会话加锁的条带锁表
+
+    会话 ID 哈希到固定数量的锁上，锁表大小与会话数量无关；同一会话的轮次互斥执行，
+    不同会话大概率落在不同的锁上，可以完全并行。同步线程和协程共用同一组锁。
+    锁不可重入：同一会话的调用不能嵌套在另一个持有该会话锁的调用中。
+    """
+
+    def __init__(self, stripes=64):
+        """
+        :param stripes: 锁的个数
+        """
+        self.stripes = stripes
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        # 每个事件循环一组 asyncio.Lock，同一事件循环中的协程先在这里排队，不占用线程
+        self._async_locks = weakref.WeakKeyDictionary()
+        self._async_locks_guard = threading.Lock()
+
+    def stripe_of(self, session_id):
+        """返回会话所在的锁下标"""
+        return hash(session_id) % self.stripes
+
+    # 多个会话按锁下标升序加锁，相同下标只加一次，避免死锁
+    def _stripes_for(self, session_ids):
+        return sorted({self.stripe_of(session_id) for session_id in session_ids})
+
+    @contextmanager
+    def hold(self, *session_ids):
+        """
+        同步持有会话锁
+        :param session_ids: 一个或多个会话 ID
+        """
+        acquired = []
+        try:
+            for index in self._stripes_for(session_ids):
+                self._locks[index].acquire()
+                acquired.append(index)
+            yield
+        finally:
+            for index in reversed(acquired):
+                self._locks[index].release()
+
+    def _get_async_locks(self):
+        loop = asyncio.get_running_loop()
+        with self._async_locks_guard:
+            locks = self._async_locks.get(loop)
+            if locks is None:
+                locks = [asyncio.Lock() for _ in range(self.stripes)]
+                self._async_locks[loop] = locks
+            return locks
+
+    @asynccontextmanager
+    async def ahold(self, *session_ids):
+        """
+        hold 的异步版本，等待锁时不阻塞事件循环
+        :param session_ids: 一个或多个会话 ID
+        """
+        async_locks = self._get_async_locks()
+        acquired_async = []
+        acquired = []
+        try:
+            for index in self._stripes_for(session_ids):
+                await async_locks[index].acquire()
+                acquired_async.append(index)
+                await acquire_thread_lock(self._locks[index])
+                acquired.append(index)
+            yield
+        finally:
+            for index in reversed(acquired):
+                self._locks[index].release()
+            for index in reversed(acquired_async):
+                async_locks[index].release()
+
+    def __repr__(self):
+        return f"SessionLocks(stripes={self.stripes})"
+
+
 class RunnableWithMessageHistory(Runnable):
     def __init__(
         self,
@@ -14,42 +100,243 @@ class RunnableWithMessageHistory(Runnable):
         *,  # 代表后面只能传关键字参数了，因为*可能匹配所有的位置 参数
         input_messages_key=None,  # 输入字典中存放用户问题的key
         history_messages_key=None,  # 历史消息键名
+        session_locks=None,  # 会话锁表，多个链条共用同一个历史存储时可以传入同一个实例
     ):
         self.runnable = runnable
         self.get_session_history = get_session_history
         self.input_messages_key = input_messages_key
         self.history_messages_key = history_messages_key
+        # 同一会话的读历史、调用、写历史作为一个整体串行执行，避免并发轮次互相覆盖
+        self.session_locks = session_locks or SessionLocks()
 
-    # 带历史的invoke调用
-    def invoke(self, input, config=None, **kwargs):
-        # 确保config是存在的，并且格式是字典
-        config = ensure_config(config)
+    # 从config中取出会话ID
+    @staticmethod
+    def _get_session_id(config):
         # 获取自定义配置部分
         configurable = config.get("configurable", {})
         session_id = configurable.get("session_id")
         if not session_id:
             raise ValueError("config['configurable']['session_id'] 必须提供")
+        return session_id
+
+    # 复制输入并放入历史消息，不修改调用方传入的字典
+    def _with_history(self, input, messages):
+        return {**input, self.history_messages_key: messages}
+
+    # 生成本轮需要写入历史的用户消息和AI消息
+    def _turn_messages(self, input, output):
+        human = HumanMessage(content=input.get(self.input_messages_key))
+        ai = output if isinstance(output, AIMessage) else AIMessage(content=output)
+        return [human, ai]
+
+    # 把本轮的用户消息和AI消息写回历史，一次 add_messages 写入
+    def _save_messages(self, history, input, output):
+        history.add_messages(self._turn_messages(input, output))
+
+    # 按会话分组：返回 {session_id: [输入下标, ...]}，组内保持输入顺序
+    def _group_by_session(self, configs):
+        groups = {}
+        for index, item_config in enumerate(configs):
+            groups.setdefault(self._get_session_id(item_config), []).append(index)
+        return groups
+
+    # 把同一批次按轮次拆分：第 r 轮包含每个会话的第 r 个输入
+    @staticmethod
+    def _rounds(groups):
+        depth = max(len(indices) for indices in groups.values())
+        return [
+            [
+                (session_id, indices[r])
+                for session_id, indices in groups.items()
+                if r < len(indices)
+            ]
+            for r in range(depth)
+        ]
+
+    # 处理一轮的输出：成功的轮次追加到会话的新消息中，失败的输入记录异常
+    def _collect_round(
+        self,
+        round_items,
+        round_inputs,
+        outputs,
+        new_messages,
+        results,
+        return_exceptions,
+    ):
+        for (session_id, index), round_input, output in zip(
+            round_items, round_inputs, outputs
+        ):
+            results[index] = output
+            if return_exceptions and isinstance(output, Exception):
+                continue
+            new_messages[session_id].extend(self._turn_messages(round_input, output))
 
-        # 拉取此用户会话历史对象
-        history: InMemoryChatMessageHistory = self.get_session_history(session_id)
-        # 准备带历史消息的输入
-        input[self.history_messages_key] = history.messages
-        # 调用底层包装好的runnable
-        output = self.runnable.invoke(input, config=config, **kwargs)
-        # 添加用户消息
-        history.add_user_message(
-            HumanMessage(content=input.get(self.input_messages_key))
-        )
-        # 添加大模型的AI消息
-        history.add_ai_message(output)
+    # 带历史的invoke调用
+    def invoke(self, input, config=None, **kwargs):
+        # 确保config是存在的，并且格式是字典
+        config = ensure_config(config)
+        session_id = self._get_session_id(config)
+
+        with self.session_locks.hold(session_id):
+            # 拉取此用户会话历史对象
+            history: InMemoryChatMessageHistory = self.get_session_history(session_id)
+            # 准备带历史消息的输入
+            input = self._with_history(input, history.messages)
+            # 调用底层包装好的runnable
+            output = self.runnable.invoke(input, config=config, **kwargs)
+            self._save_messages(history, input, output)
         return output
 
-    def batch(self, inputs, config=None, **kwargs):
-        return [self.invoke(input, config=config, **kwargs) for input in inputs]
+    # 带历史的异步调用，历史读写可能涉及数据库等阻塞操作，放到线程池中执行
+    async def ainvoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        session_id = self._get_session_id(config)
+        async with self.session_locks.ahold(session_id):
+            history = await run_in_executor(None, self.get_session_history, session_id)
+            messages = await run_in_executor(None, lambda: history.messages)
+            input = self._with_history(input, messages)
+            output = await self.runnable.ainvoke(input, config=config, **kwargs)
+            await run_in_executor(None, self._save_messages, history, input, output)
+        return output
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        """
+        批量带历史调用
+
+        按 session_id 分组，每个会话只读取一次历史、只调用一次 add_messages 写回；
+        同一会话的多个输入按顺序分成多轮，每轮调用一次底层 runnable 的 batch，
+        后一轮能看到前一轮产生的消息。
+        :param inputs: 输入字典列表
+        :param config: 配置字典，或与输入等长的配置字典列表，每项都需要 session_id
+        :param return_exceptions: 为 True 时单个输入出错不会中断整批，出错的轮次不写入历史
+        :param kwargs: 额外的关键字参数
+        :return: 输出值列表，顺序与输入一致
+        """
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        groups = self._group_by_session(configs)
+        # 一次性锁住本批次涉及的所有会话
+        with self.session_locks.hold(*groups):
+            return self._batch_locked(
+                inputs, configs, groups, return_exceptions, **kwargs
+            )
 
+    def _batch_locked(self, inputs, configs, groups, return_exceptions, **kwargs):
+        histories = {sid: self.get_session_history(sid) for sid in groups}
+        # 每个会话的历史只读取一次，之后在内存中追加本批次产生的消息
+        loaded = {sid: list(history.messages) for sid, history in histories.items()}
+        new_messages = {sid: [] for sid in groups}
+        results = [None] * len(inputs)
+        try:
+            for round_items in self._rounds(groups):
+                round_inputs = [
+                    self._with_history(inputs[index], loaded[sid] + new_messages[sid])
+                    for sid, index in round_items
+                ]
+                outputs = self.runnable.batch(
+                    round_inputs,
+                    config=[configs[index] for _, index in round_items],
+                    return_exceptions=return_exceptions,
+                    **kwargs,
+                )
+                self._collect_round(
+                    round_items,
+                    round_inputs,
+                    outputs,
+                    new_messages,
+                    results,
+                    return_exceptions,
+                )
+        finally:
+            # 即使中途出错，已经完成的轮次也写回历史，每个会话一次
+            for sid, messages in new_messages.items():
+                if messages:
+                    histories[sid].add_messages(messages)
+        return results
+
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        groups = self._group_by_session(configs)
+        async with self.session_locks.ahold(*groups):
+            return await self._abatch_locked(
+                inputs, configs, groups, return_exceptions, **kwargs
+            )
+
+    async def _abatch_locked(
+        self, inputs, configs, groups, return_exceptions, **kwargs
+    ):
+        # 历史的读写可能是阻塞的数据库操作，放到线程池中执行
+        def _load():
+            histories = {sid: self.get_session_history(sid) for sid in groups}
+            loaded = {sid: list(h.messages) for sid, h in histories.items()}
+            return histories, loaded
+
+        def _flush():
+            for sid, messages in new_messages.items():
+                if messages:
+                    histories[sid].add_messages(messages)
+
+        histories, loaded = await run_in_executor(None, _load)
+        new_messages = {sid: [] for sid in groups}
+        results = [None] * len(inputs)
+        try:
+            for round_items in self._rounds(groups):
+                round_inputs = [
+                    self._with_history(inputs[index], loaded[sid] + new_messages[sid])
+                    for sid, index in round_items
+                ]
+                outputs = await self.runnable.abatch(
+                    round_inputs,
+                    config=[configs[index] for _, index in round_items],
+                    return_exceptions=return_exceptions,
+                    **kwargs,
+                )
+                self._collect_round(
+                    round_items,
+                    round_inputs,
+                    outputs,
+                    new_messages,
+                    results,
+                    return_exceptions,
+                )
+        finally:
+            await run_in_executor(None, _flush)
+        return results
+
+    # 流式调用：底层 runnable 的分块边产出边返回，结束后把合并的完整输出写回历史
+    # 会话锁一直持有到流式输出结束；提前放弃迭代时，生成器关闭后才会释放锁
     def stream(self, input, config=None, **kwargs):
-        output = self.invoke(input, config=config, **kwargs)
-        yield output
+        config = ensure_config(config)
+        session_id = self._get_session_id(config)
+        with self.session_locks.hold(session_id):
+            history = self.get_session_history(session_id)
+            input = self._with_history(input, history.messages)
+            output = None
+            for chunk in self.runnable.stream(input, config=config, **kwargs):
+                yield chunk
+                output = _add_chunks(output, chunk)
+            self._save_messages(history, input, output)
+
+    async def astream(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        session_id = self._get_session_id(config)
+        async with self.session_locks.ahold(session_id):
+            history = await run_in_executor(None, self.get_session_history, session_id)
+            messages = await run_in_executor(None, lambda: history.messages)
+            input = self._with_history(input, messages)
+            output = None
+            async for chunk in self.runnable.astream(input, config=config, **kwargs):
+                yield chunk
+                output = _add_chunks(output, chunk)
+            await run_in_executor(None, self._save_messages, history, input, output)
+
+    def _streams_incrementally(self):
+        return self.runnable._streams_incrementally()
 
     def __repr__(self):
         return f"""RunnableWithMessageHistory(
@@ -1,4 +1,13 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import FIRST_EXCEPTION, wait
+
 from .runnable import Runnable
+from ..config import ensure_config, get_executor_for_config, submit_in_context
+
+# 分支流式输出结束的标记
+_DONE = object()
 
 
 class RunnableParallel(Runnable):
@@ -25,34 +34,152 @@ class RunnableParallel(Runnable):
         :param kwargs:
         :return:
         """
-        # 遍历每个 runnable，调用其 invoke，结果收集为 {name: 返回值}
-        return {
-            name: r.invoke(input, config=None, **kwargs)
-            for name, r in self.runnables.items()
-        }
+        config = ensure_config(config)
+        # 所有分支共享同一个线程池并发执行，线程数由 max_concurrency 控制
+        with get_executor_for_config(config) as executor:
+            futures = {
+                submit_in_context(
+                    executor, runnable.invoke, input, config.copy(), **kwargs
+                ): name
+                for name, runnable in self.runnables.items()
+            }
+            # 任意一个分支抛出异常即返回，取消尚未开始的兄弟分支
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in done:
+                if future.exception() is not None:
+                    for pending in not_done:
+                        pending.cancel()
+                    raise future.exception()
+        # 按声明顺序收集结果为 {name: 返回值}
+        results = {futures[future]: future.result() for future in futures}
+        return {name: results[name] for name in self.runnables}
 
-    # 批量调用，对输入列表每一项都运行 invoke，返回结果字典的列表
-    def batch(self, inputs: list, config=None, **kwargs):
+    # 异步调用，所有子 runnable 在同一个事件循环中并发执行
+    async def ainvoke(self, input, config=None, **kwargs):
         """
-        对输入列表逐项并行处理，返回字典列表。
-        :param inputs:
+        同一输入并发传给所有子 runnable 的 ainvoke，收集结果为字典。
+        max_concurrency 限制同时运行的分支数，任一分支失败会取消其余分支。
+        :param input:
         :param config:
         :param kwargs:
         :return:
         """
-        return [self.invoke(item, config=None, **kwargs) for item in inputs]
+        config = ensure_config(config)
+        max_concurrency = config.get("max_concurrency")
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def _run_branch(runnable):
+            if semaphore is None:
+                return await runnable.ainvoke(input, config=config.copy(), **kwargs)
+            async with semaphore:
+                return await runnable.ainvoke(input, config=config.copy(), **kwargs)
 
-    # 流式调用，直接调用父类的流式实现
+        tasks = {
+            asyncio.ensure_future(_run_branch(runnable)): name
+            for name, runnable in self.runnables.items()
+        }
+        try:
+            done, pending = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_EXCEPTION
+            )
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            # 出现异常或外部取消时，取消仍在运行的兄弟分支
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        results = {tasks[task]: task.result() for task in tasks}
+        return {name: results[name] for name in self.runnables}
+
+    # 流式调用：所有分支并发执行，哪个分支产出分块就立即返回 {name: 分块}
     def stream(self, input, config=None, **kwargs):
         """
-        对单次输入执行并返回一个字典，流式单次产出。
+        所有分支并发流式执行，各分支的分块交错产出，每个分块标注所属分支的键名。
+        任一分支出错时停止其余分支并抛出该异常。
         :param input:
         :param config:
         :param kwargs:
         :return:
         """
-        for name, runnable in self.runnables.items():
-            yield {name: runnable.invoke(input, config=None, **kwargs)}
+        config = ensure_config(config)
+        # 各分支把 (键名, 分块, 异常) 放入同一个队列，分块为 _DONE 表示该分支结束
+        chunks = queue.Queue()
+        # 出错或调用方提前结束迭代时，通知各分支停止
+        stop = threading.Event()
+
+        def _stream_branch(name, runnable):
+            try:
+                for chunk in runnable.stream(input, config=config.copy(), **kwargs):
+                    if stop.is_set():
+                        break
+                    chunks.put((name, chunk, None))
+            except Exception as e:
+                chunks.put((name, None, e))
+            chunks.put((name, _DONE, None))
+
+        with get_executor_for_config(config) as executor:
+            for name, runnable in self.runnables.items():
+                submit_in_context(executor, _stream_branch, name, runnable)
+            remaining = len(self.runnables)
+            try:
+                while remaining:
+                    name, chunk, error = chunks.get()
+                    if error is not None:
+                        raise error
+                    if chunk is _DONE:
+                        remaining -= 1
+                        continue
+                    yield {name: chunk}
+            finally:
+                stop.set()
+
+    # 异步流式调用：每个分支一个任务，分块按到达顺序交错产出
+    async def astream(self, input, config=None, **kwargs):
+        """
+        所有分支并发异步流式执行，各分支的分块交错产出。
+        :param input:
+        :param config:
+        :param kwargs:
+        :return:
+        """
+        config = ensure_config(config)
+        chunks = asyncio.Queue()
+
+        async def _stream_branch(name, runnable):
+            try:
+                async for chunk in runnable.astream(
+                    input, config=config.copy(), **kwargs
+                ):
+                    await chunks.put((name, chunk, None))
+            except Exception as e:
+                await chunks.put((name, None, e))
+            await chunks.put((name, _DONE, None))
+
+        tasks = [
+            asyncio.ensure_future(_stream_branch(name, runnable))
+            for name, runnable in self.runnables.items()
+        ]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                name, chunk, error = await chunks.get()
+                if error is not None:
+                    raise error
+                if chunk is _DONE:
+                    remaining -= 1
+                    continue
+                yield {name: chunk}
+        finally:
+            # 出错或调用方提前结束时取消仍在运行的分支
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    # 各分支的分块按键合并，所有分支都能按块还原时整体才能还原
+    def _streams_incrementally(self):
+        return all(r._streams_incrementally() for r in self.runnables.values())
 
     # 返回对象的字符串表示（列出包含的所有子 runnable 的键名）
     def __repr__(self):
@@ -5,12 +5,27 @@ class RunnablePassthrough(Runnable):
     def invoke(self, input, config=None, **kwargs):
         return input
 
-    def batch(self, inputs: list, config=None, **kwargs):
+    def batch(self, inputs: list, config=None, *, return_exceptions=False, **kwargs):
         return list(inputs)
 
     def stream(self, input, config=None, **kwargs):
         # 复用基类流式封装（对单值直接 yield）
         yield from super().stream(input, config=None, **kwargs)
 
+    async def ainvoke(self, input, config=None, **kwargs):
+        # 直接透传，无需切换到线程池
+        return input
+
+    async def astream(self, input, config=None, **kwargs):
+        yield input
+
+    # 流式转换：上游的分块原样透传，不做任何缓冲
+    def transform(self, input_iterator, config=None, **kwargs):
+        yield from input_iterator
+
+    async def atransform(self, input_aiterator, config=None, **kwargs):
+        async for chunk in input_aiterator:
+            yield chunk
+
     def __repr__(self):
         return f"RunnablePassthrough()"
@@ -0,0 +1,153 @@
+"""进程池执行：让 CPU 密集的函数绕开 GIL，在多个进程中并行处理批量输入"""
+
+import itertools
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+# 按进程数缓存的进程池，多个 RunnableLambda 共享，避免每次批量调用都重新启动进程
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+
+# 进程数为 None 时使用 CPU 核数
+def _resolve_workers(workers):
+    return workers or os.cpu_count() or 1
+
+
+def get_process_pool(workers=None):
+    """
+    获取可复用的进程池
+    :param workers: 进程数，None 表示使用 CPU 核数
+    :return: ProcessPoolExecutor
+    """
+    workers = _resolve_workers(workers)
+    with _process_pools_lock:
+        pool = _process_pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            _process_pools[workers] = pool
+        return pool
+
+
+def _discard_process_pool(workers, pool):
+    # 进程池损坏（例如子进程被杀死）后丢弃，下次调用时重新创建
+    workers = _resolve_workers(workers)
+    with _process_pools_lock:
+        if _process_pools.get(workers) is pool:
+            del _process_pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_process_pools():
+    """关闭所有缓存的进程池"""
+    with _process_pools_lock:
+        pools = list(_process_pools.values())
+        _process_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+# 在子进程中执行一组输入，每个结果标记成功或失败，单个输入出错不影响同组的其它输入
+def _run_chunk(func, kwargs, chunk):
+    results = []
+    for input in chunk:
+        try:
+            results.append((True, func(input, **kwargs)))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+
+def _default_chunksize(count, workers):
+    # 每个进程大约分到 4 个分块，兼顾进程间通信开销和负载均衡
+    return max(1, count // (_resolve_workers(workers) * 4))
+
+
+def iter_process_chunks(
+    func,
+    inputs,
+    kwargs=None,
+    *,
+    workers=None,
+    chunksize=None,
+    window=None,
+    ordered=True,
+):
+    """
+    把输入分块提交到进程池执行
+
+    每个分块作为一个任务提交，减少进程间通信的次数；最多同时有 window 个分块在执行，
+    输入可以是生成器，按需读取。
+    :param func: 可以被 pickle 的函数
+    :param inputs: 输入值的可迭代对象
+    :param kwargs: 调用函数时的关键字参数
+    :param workers: 进程数
+    :param chunksize: 每个分块的输入个数
+    :param window: 同时执行的分块数，默认是进程数的 2 倍
+    :param ordered: 为 True 时按输入顺序产出
+    :return: 生成器，产出 (输入下标, 是否成功, 输出值或异常)
+    """
+    kwargs = kwargs or {}
+    chunksize = chunksize or 1
+    pool = get_process_pool(workers)
+    window = window or _resolve_workers(workers) * 2
+    indexed_inputs = enumerate(inputs)
+    # 保存正在执行的 (起始下标, future)，按提交顺序排列
+    in_flight = deque()
+
+    def _submit(count):
+        for _ in range(count):
+            chunk = list(itertools.islice(indexed_inputs, chunksize))
+            if not chunk:
+                return
+            future = pool.submit(_run_chunk, func, kwargs, [x for _, x in chunk])
+            in_flight.append((chunk[0][0], future))
+
+    try:
+        _submit(window)
+        while in_flight:
+            if ordered:
+                finished = [in_flight.popleft()]
+            else:
+                done, _ = wait([f for _, f in in_flight], return_when=FIRST_COMPLETED)
+                finished = [item for item in in_flight if item[1] in done]
+                for item in finished:
+                    in_flight.remove(item)
+            # 先拿到结果再补充新的分块，让执行和消费重叠
+            results = [(start, future.result()) for start, future in finished]
+            _submit(len(finished))
+            for start, chunk_results in results:
+                for offset, (ok, value) in enumerate(chunk_results):
+                    yield start + offset, ok, value
+    except BrokenProcessPool:
+        _discard_process_pool(workers, pool)
+        raise
+    finally:
+        # 提前结束迭代时取消尚未开始的分块
+        for _, future in in_flight:
+            future.cancel()
+
+
+def run_in_process_pool(func, inputs, kwargs=None, *, workers=None, chunksize=None):
+    """
+    在进程池中批量执行函数，结果顺序与输入顺序一致
+    :param func: 可以被 pickle 的函数
+    :param inputs: 输入值列表
+    :param kwargs: 调用函数时的关键字参数
+    :param workers: 进程数
+    :param chunksize: 每个分块的输入个数，默认按输入数和进程数计算
+    :return: (是否成功, 输出值或异常) 的列表
+    """
+    inputs = list(inputs)
+    chunksize = chunksize or _default_chunksize(len(inputs), workers)
+    # 所有分块一次性提交
+    window = -(-len(inputs) // chunksize) or 1
+    results = [None] * len(inputs)
+    for index, ok, value in iter_process_chunks(
+        func, inputs, kwargs, workers=workers, chunksize=chunksize, window=window
+    ):
+        results[index] = (ok, value)
+    return results
@@ -0,0 +1,271 @@
+"""限流与隔离：令牌桶限制请求速率和 token 用量，信号量限制单个依赖的并发数"""
+
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from .runnable import Runnable
+from ..config import ensure_config, acquire_thread_lock
+
+
+def estimate_tokens(input):
+    """
+    粗略估算输入的 token 数（约 4 个字符一个 token）
+    :param input: 字符串、消息、消息列表、提示词值或字典
+    :return: 估算的 token 数，至少为 1
+    """
+    if hasattr(input, "to_messages"):
+        input = input.to_messages()
+    if isinstance(input, str):
+        text_length = len(input)
+    elif isinstance(input, dict):
+        text_length = sum(len(str(value)) for value in input.values())
+    elif isinstance(input, (list, tuple)):
+        text_length = sum(len(str(getattr(item, "content", item))) for item in input)
+    else:
+        text_length = len(str(getattr(input, "content", input)))
+    return max(1, text_length // 4)
+
+
+class _TokenBucket:
+    """
+    令牌桶
+
+    采用预约方式扣减：余额可以为负，调用方按欠额计算需要等待的时间，
+    先到先得，同步线程和协程可以共用同一个桶。调用方需要自行加锁。
+    """
+
+    def __init__(self, rate, capacity):
+        """
+        :param rate: 每秒补充的令牌数
+        :param capacity: 桶容量，即允许的突发量
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def reserve(self, amount, now):
+        """
+        预约 amount 个令牌
+        :return: 需要等待的秒数
+        """
+        # 按流逝的时间补充令牌，不超过容量
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        # 单次需求超过容量时按容量计算，避免永远等不到
+        self.tokens -= min(amount, self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """
+    速率限制器
+
+    同时限制每秒请求数和每分钟 token 数。线程安全，并提供 asyncio 版本的 aacquire，
+    同一个实例可以被多个 Runnable 共享，例如使用同一个 API key 的多个模型。
+    """
+
+    def __init__(self, requests_per_second=None, tokens_per_minute=None):
+        """
+        初始化速率限制器
+        :param requests_per_second: 每秒允许的请求数，None 表示不限制
+        :param tokens_per_minute: 每分钟允许的 token 数，None 表示不限制
+        """
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self._request_bucket = (
+            _TokenBucket(requests_per_second, max(1.0, requests_per_second))
+            if requests_per_second
+            else None
+        )
+        self._token_bucket = (
+            _TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+            if tokens_per_minute
+            else None
+        )
+        self._lock = threading.Lock()
+        # 获取许可的次数和累计等待时间
+        self.acquired = 0
+        self.total_wait = 0.0
+
+    def _reserve(self, tokens):
+        now = time.monotonic()
+        with self._lock:
+            wait = 0.0
+            if self._request_bucket is not None:
+                wait = max(wait, self._request_bucket.reserve(1, now))
+            if self._token_bucket is not None and tokens:
+                wait = max(wait, self._token_bucket.reserve(tokens, now))
+            self.acquired += 1
+            self.total_wait += wait
+        return wait
+
+    def acquire(self, tokens=0):
+        """
+        获取一次请求许可，必要时阻塞当前线程
+        :param tokens: 本次请求预计消耗的 token 数
+        :return: 实际等待的秒数
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens=0):
+        """
+        acquire 的异步版本，等待时不阻塞事件循环
+        :param tokens: 本次请求预计消耗的 token 数
+        :return: 实际等待的秒数
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self):
+        """
+        返回限流统计
+        :return: 包含 acquired、total_wait 的字典
+        """
+        with self._lock:
+            return {"acquired": self.acquired, "total_wait": self.total_wait}
+
+    def __repr__(self):
+        return (
+            f"RateLimiter(requests_per_second={self.requests_per_second}, "
+            f"tokens_per_minute={self.tokens_per_minute})"
+        )
+
+
+# 按名称共享的速率限制器
+_shared_limiters = {}
+_shared_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(key, requests_per_second=None, tokens_per_minute=None):
+    """
+    获取按名称共享的速率限制器，同一个 key（例如 API key）总是返回同一个实例
+    :param key: 共享名称
+    :param requests_per_second: 首次创建时使用的每秒请求数
+    :param tokens_per_minute: 首次创建时使用的每分钟 token 数
+    :return: RateLimiter
+    """
+    with _shared_limiters_lock:
+        limiter = _shared_limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(requests_per_second, tokens_per_minute)
+            _shared_limiters[key] = limiter
+        return limiter
+
+
+class RunnableRateLimited(Runnable):
+    """
+    带限流的 Runnable
+
+    每次调用先从共享的 RateLimiter 获取许可，再占用本 Runnable 独立的并发槽位，
+    这样一个变慢的依赖最多占用 max_concurrent 个工作线程，不会拖垮整个线程池。
+    同步线程和各个事件循环中的协程共用同一组并发槽位。
+    """
+
+    def __init__(
+        self, bound, rate_limiter=None, max_concurrent=None, token_counter=None
+    ):
+        """
+        初始化限流包装
+        :param bound: 被包装的可运行对象
+        :param rate_limiter: 速率限制器，可以在多个 Runnable 之间共享，None 表示不限速
+        :param max_concurrent: 本 Runnable 的最大并发调用数，None 表示不限制
+        :param token_counter: 估算输入 token 数的函数，默认使用 estimate_tokens
+        """
+        self.bound = bound
+        self.rate_limiter = rate_limiter
+        self.max_concurrent = max_concurrent
+        self.token_counter = token_counter or estimate_tokens
+        self._semaphore = (
+            threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        )
+        # 每个事件循环一把 asyncio.Lock：同一事件循环中的协程先在这里排队，
+        # 同一事件循环中同一时刻最多只有一个协程轮询并发槽位
+        self._async_gates = weakref.WeakKeyDictionary()
+        self._async_gates_lock = threading.Lock()
+
+    def _tokens(self, input):
+        if self.rate_limiter is None or not self.rate_limiter.tokens_per_minute:
+            return 0
+        return self.token_counter(input)
+
+    def _get_async_gate(self):
+        loop = asyncio.get_running_loop()
+        with self._async_gates_lock:
+            gate = self._async_gates.get(loop)
+            if gate is None:
+                gate = asyncio.Lock()
+                self._async_gates[loop] = gate
+            return gate
+
+    # 异步占用并发槽位，等待时不阻塞事件循环
+    @asynccontextmanager
+    async def _ahold_slot(self):
+        async with self._get_async_gate():
+            await acquire_thread_lock(self._semaphore)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    def invoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self._tokens(input))
+        if self._semaphore is None:
+            return self.bound.invoke(input, config, **kwargs)
+        with self._semaphore:
+            return self.bound.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.aacquire(self._tokens(input))
+        if self._semaphore is None:
+            return await self.bound.ainvoke(input, config, **kwargs)
+        async with self._ahold_slot():
+            return await self.bound.ainvoke(input, config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self._tokens(input))
+        if self._semaphore is None:
+            yield from self.bound.stream(input, config, **kwargs)
+            return
+        # 流式输出结束前一直占用并发槽位
+        with self._semaphore:
+            yield from self.bound.stream(input, config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.aacquire(self._tokens(input))
+        if self._semaphore is None:
+            async for chunk in self.bound.astream(input, config, **kwargs):
+                yield chunk
+            return
+        async with self._ahold_slot():
+            async for chunk in self.bound.astream(input, config, **kwargs):
+                yield chunk
+
+    def _streams_incrementally(self):
+        return self.bound._streams_incrementally()
+
+    def __repr__(self):
+        return (
+            f"RunnableRateLimited(bound={self.bound!r}, "
+            f"rate_limiter={self.rate_limiter!r}, max_concurrent={self.max_concurrent})"
+        )
@@ -0,0 +1,188 @@
+"""按键路由：用字典一次查找选出目标 Runnable，批量调用时按目标分组"""
+
+import asyncio
+
+from .runnable import Runnable
+from ..config import (
+    get_config_list,
+    get_executor_for_config,
+    submit_in_context,
+)
+
+
+# 把每个输入按选中的目标分组，每个目标只调用一次 batch，再按原顺序还原结果
+def _batch_grouped(targets, inputs, configs, *, return_exceptions=False, **kwargs):
+    """
+    :param targets: 与输入等长的列表，每一项是选中的 Runnable，或选路时抛出的异常
+    :param inputs: 输入值列表
+    :param configs: 与输入等长的配置列表
+    :return: 与输入顺序一致的输出列表
+    """
+    results = [None] * len(inputs)
+    # id(目标) -> (目标, 输入下标列表)，按首次出现的顺序排列
+    groups = {}
+    for index, target in enumerate(targets):
+        if isinstance(target, Exception):
+            if not return_exceptions:
+                raise target
+            results[index] = target
+            continue
+        groups.setdefault(id(target), (target, []))[1].append(index)
+
+    def _run_group(target, indices):
+        return target.batch(
+            [inputs[i] for i in indices],
+            config=[configs[i] for i in indices],
+            return_exceptions=return_exceptions,
+            **kwargs,
+        )
+
+    group_list = list(groups.values())
+    if len(group_list) == 1:
+        outputs_list = [_run_group(*group_list[0])]
+    else:
+        # 不同目标之间互不依赖，并发执行各组的 batch
+        with get_executor_for_config(configs[0]) as executor:
+            futures = [
+                submit_in_context(executor, _run_group, target, indices)
+                for target, indices in group_list
+            ]
+            outputs_list = [future.result() for future in futures]
+    for (_, indices), outputs in zip(group_list, outputs_list):
+        for index, output in zip(indices, outputs):
+            results[index] = output
+    return results
+
+
+# _batch_grouped 的异步版本
+async def _abatch_grouped(
+    targets, inputs, configs, *, return_exceptions=False, **kwargs
+):
+    results = [None] * len(inputs)
+    groups = {}
+    for index, target in enumerate(targets):
+        if isinstance(target, Exception):
+            if not return_exceptions:
+                raise target
+            results[index] = target
+            continue
+        groups.setdefault(id(target), (target, []))[1].append(index)
+    group_list = list(groups.values())
+    outputs_list = await asyncio.gather(
+        *(
+            target.abatch(
+                [inputs[i] for i in indices],
+                config=[configs[i] for i in indices],
+                return_exceptions=return_exceptions,
+                **kwargs,
+            )
+            for target, indices in group_list
+        )
+    )
+    for (_, indices), outputs in zip(group_list, outputs_list):
+        for index, output in zip(indices, outputs):
+            results[index] = output
+    return results
+
+
+class RunnableRouter(Runnable):
+    """
+    按键路由的 Runnable
+
+    key_func 从输入中提取路由键，再从 routes 字典中直接取出目标 Runnable，
+    选路的开销与路由数量无关。批量调用时同一目标的输入合并为一次 batch 调用。
+    """
+
+    def __init__(self, key_func, routes, default=None):
+        """
+        初始化路由
+        :param key_func: 从输入中提取路由键的函数
+        :param routes: 路由键到 Runnable 的字典
+        :param default: 没有匹配的路由键时使用的 Runnable，None 表示抛出异常
+        """
+        if not callable(key_func):
+            raise TypeError("key_func 必须是可调用对象")
+        for key, runnable in routes.items():
+            if not isinstance(runnable, Runnable):
+                raise TypeError(f"路由 {key!r} 的目标必须是Runnable实例")
+        if default is not None and not isinstance(default, Runnable):
+            raise TypeError("默认runnable必须是Runnable实例")
+        self.key_func = key_func
+        self.routes = dict(routes)
+        self.default = default
+
+    # 根据输入选出目标 Runnable
+    def _select_route(self, input):
+        key = self.key_func(input)
+        runnable = self.routes.get(key, self.default)
+        if runnable is None:
+            raise ValueError(f"没有与路由键 {key!r} 对应的路由，也没有提供默认路由")
+        return runnable
+
+    # 逐个选路，return_exceptions 时把选路失败的异常放在对应位置
+    def _select_routes(self, inputs, return_exceptions):
+        targets = []
+        for input in inputs:
+            try:
+                targets.append(self._select_route(input))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                targets.append(e)
+        return targets
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._select_route(input).invoke(input, config=config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        runnable = self._select_route(input)
+        return await runnable.ainvoke(input, config=config, **kwargs)
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        """
+        批量调用：按路由分组，每个目标只调用一次 batch，输出顺序与输入顺序一致
+        :param inputs: 输入值列表
+        :param config: 可选的配置字典，或与输入等长的配置字典列表
+        :param return_exceptions: 为 True 时单个输入出错不会中断整批
+        :param kwargs: 额外的关键字参数
+        :return: 输出值列表
+        """
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        targets = self._select_routes(inputs, return_exceptions)
+        return _batch_grouped(
+            targets, inputs, configs, return_exceptions=return_exceptions, **kwargs
+        )
+
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        targets = self._select_routes(inputs, return_exceptions)
+        return await _abatch_grouped(
+            targets, inputs, configs, return_exceptions=return_exceptions, **kwargs
+        )
+
+    def stream(self, input, config=None, **kwargs):
+        runnable = self._select_route(input)
+        yield from runnable.stream(input, config=config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs):
+        runnable = self._select_route(input)
+        async for chunk in runnable.astream(input, config=config, **kwargs):
+            yield chunk
+
+    def _streams_incrementally(self):
+        targets = [*self.routes.values()]
+        if self.default is not None:
+            targets.append(self.default)
+        return all(runnable._streams_incrementally() for runnable in targets)
+
+    def __repr__(self):
+        routes = ", ".join(
+            f"{key!r}: {runnable!r}" for key, runnable in self.routes.items()
+        )
+        return f"RunnableRouter(routes={{{routes}}}, default={self.default!r})"
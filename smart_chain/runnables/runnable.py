@@ -1,9 +1,77 @@
+import asyncio
+import contextvars
+import itertools
+import queue
 import random
+import threading
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
 from abc import ABC, abstractmethod
 import inspect
 import uuid as uuid_module
-from ..config import ensure_config, _accept_config, _merge_configs
+from ..callbacks import CallbackManager
+from ..config import (
+    ensure_config,
+    _accept_config,
+    _merge_configs,
+    run_in_executor,
+    get_config_list,
+    get_executor_for_config,
+    submit_in_context,
+    check_deadline,
+    get_remaining_time,
+    wait_for_deadline,
+    DeadlineExceededError,
+)
+
+
+# 把两个流式分块合并为一个：字典按键合并，其它类型尝试使用 + 拼接
+def _add_chunks(left, right):
+    if left is None:
+        return right
+    if isinstance(left, dict) and isinstance(right, dict):
+        merged = dict(left)
+        for key, value in right.items():
+            merged[key] = _add_chunks(merged.get(key), value)
+        return merged
+    try:
+        return left + right
+    except TypeError:
+        # 无法拼接的分块以最新的为准
+        return right
+
+
+# 把上游的所有分块合并为一个完整的输入
+def _collect_chunks(input_iterator):
+    final = None
+    for chunk in input_iterator:
+        final = _add_chunks(final, chunk)
+    return final
+
+
+# _collect_chunks 的异步版本
+async def _acollect_chunks(input_aiterator):
+    final = None
+    async for chunk in input_aiterator:
+        final = _add_chunks(final, chunk)
+    return final
+
+
+# 在线程池中逐块迭代同步迭代器，把阻塞的流式输出桥接为异步生成器
+async def _aiter_in_executor(iterator):
+    sentinel = object()
+    while True:
+        chunk = await run_in_executor(None, next, iterator, sentinel)
+        if chunk is sentinel:
+            break
+        yield chunk
+
+
+# 判断一个值在流式输出时是否需要逐项展开
+def _is_streamable_result(result):
+    # 字符串/字节/字典不视为可迭代，直接作为单值返回
+    return hasattr(result, "__iter__") and not isinstance(result, (str, dict, bytes))
 
 
 class Runnable(ABC):
@@ -13,6 +81,9 @@ class Runnable(ABC):
     所有可运行组件的基础接口，定义了统一的调用方法。
     """
 
+    # 计算缓存命名空间时跳过的属性，子类用它排除调用计数等运行时状态
+    _fingerprint_exclude = frozenset()
+
     # 抽象方法，子类必须实现，用于同步调用
     @abstractmethod
     def invoke(self, input, config=None, **kwargs):
@@ -37,25 +108,232 @@ class Runnable(ABC):
         """
         result = self.invoke(input, config=config, **kwargs)
         # 字符串/字节/字典不视为可迭代，直接返回单值
-        if hasattr(result, "__iter__") and not isinstance(result, (str, dict, bytes)):
+        if _is_streamable_result(result):
             for item in result:
                 yield item
         else:
             yield result
 
-    # 定义批量调用方法，默认实现为遍历输入逐个调用 invoke
-    def batch(self, inputs: list, config=None, **kwargs):
+    def transform(self, input_iterator, config=None, **kwargs):
+        """
+        流式转换：消费上游产出的分块，并产出本组件的分块
+
+        默认实现：先把上游的分块全部合并为完整输入，再调用 stream。
+        能够边接收边处理的子类应重写此方法，链式流式调用依赖它逐段传递分块。
+        :param input_iterator: 上游分块的迭代器
+        :param config: 可选的配置字典
+        :param kwargs: 额外的关键字参数
+        :return: 生成器
+        """
+        final = _collect_chunks(input_iterator)
+        yield from self.stream(final, config=config, **kwargs)
+
+    async def atransform(self, input_aiterator, config=None, **kwargs):
+        """
+        异步流式转换，transform 的异步版本
+        :param input_aiterator: 上游分块的异步迭代器
+        :param config: 可选的配置字典
+        :param kwargs: 额外的关键字参数
+        :return: 异步生成器
+        """
+        final = await _acollect_chunks(input_aiterator)
+        async for chunk in self.astream(final, config=config, **kwargs):
+            yield chunk
+
+    def _streams_incrementally(self):
+        """
+        流式输出的分块能否用 _add_chunks 合并还原为 invoke 的结果
+
+        默认的 stream 只是把 invoke 的结果展开，列表会被拆成逐项的分块，合并后无法还原；
+        重写了 stream 或 transform 的组件视为真正按块产出。
+        链式流式调用据此决定把上一步的分块传给下一步，还是直接使用上一步 invoke 的结果。
+        """
+        return (
+            type(self).stream is not Runnable.stream
+            or type(self).transform is not Runnable.transform
+        )
+
+    # 定义批量调用方法，默认实现为在线程池中并发调用 invoke
+    def batch(self, inputs: list, config=None, *, return_exceptions=False, **kwargs):
         """
         批量调用 Runnable
+
+        每个输入在线程池中并发执行 invoke，线程数由 config 中的 max_concurrency 决定，
+        输出顺序与输入顺序保持一致。
         :param inputs: 输入值列表
-        config: 可选的配置字典
+        :param config: 可选的配置字典，或与输入等长的配置字典列表
+        :param return_exceptions: 为 True 时单个输入出错不会中断整批，异常对象放在对应位置返回
         :param kwargs: 额外的关键字参数
         :return:
             输出值列表
         """
-        return [
-            self.invoke(input_item, config=config, **kwargs) for input_item in inputs
-        ]
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        # 为每个输入准备独立的配置
+        configs = get_config_list(config, len(inputs))
+
+        def _invoke_item(input_item, item_config):
+            if not return_exceptions:
+                return self.invoke(input_item, config=item_config, **kwargs)
+            try:
+                return self.invoke(input_item, config=item_config, **kwargs)
+            except Exception as e:
+                return e
+
+        # 只有一个输入时无需创建线程池
+        if len(inputs) == 1:
+            return [_invoke_item(inputs[0], configs[0])]
+        with get_executor_for_config(configs[0]) as executor:
+            futures = [
+                submit_in_context(executor, _invoke_item, input_item, item_config)
+                for input_item, item_config in zip(inputs, configs)
+            ]
+            return [future.result() for future in futures]
+
+    # 流式批量调用：惰性读取输入，并限制同时执行的调用数
+    def batch_iter(
+        self,
+        inputs,
+        config=None,
+        *,
+        window: int = 16,
+        ordered: bool = True,
+        return_exceptions=False,
+        **kwargs,
+    ):
+        """
+        流式批量调用 Runnable
+
+        从可迭代对象中按需拉取输入，最多同时有 window 个调用在执行，
+        每完成一个就补充一个新的输入，内存占用与输入总量无关。
+        :param inputs: 输入值的可迭代对象，可以是生成器
+        :param config: 可选的配置字典，所有输入共享
+        :param window: 同时执行的最大调用数
+        :param ordered: 为 True 时按输入顺序产出；为 False 时谁先完成先产出
+        :param return_exceptions: 为 True 时单个输入出错不会中断迭代，异常对象作为输出产出
+        :param kwargs: 额外的关键字参数
+        :return: 生成器，产出 (输入下标, 输出值) 元组
+        """
+        if window < 1:
+            raise ValueError("window 必须大于等于 1")
+        # 所有输入共享同一份配置，去掉 run_id 避免多个调用共用
+        config = get_config_list(config, 2)[0]
+        # 给输入编号，便于调用方把输出和输入对应起来
+        indexed_inputs = enumerate(inputs)
+
+        def _invoke_item(input_item):
+            if not return_exceptions:
+                return self.invoke(input_item, config=config.copy(), **kwargs)
+            try:
+                return self.invoke(input_item, config=config.copy(), **kwargs)
+            except Exception as e:
+                return e
+
+        with get_executor_for_config({"max_concurrency": window}) as executor:
+            # 保存正在执行的 (下标, future)，按提交顺序排列
+            in_flight = deque()
+
+            # 从输入中再拉取最多 count 个并提交执行
+            def _submit(count):
+                for index, input_item in itertools.islice(indexed_inputs, count):
+                    future = submit_in_context(executor, _invoke_item, input_item)
+                    in_flight.append((index, future))
+
+            # 先填满窗口
+            _submit(window)
+            while in_flight:
+                if ordered:
+                    # 按顺序等待队首的调用完成
+                    index, future = in_flight.popleft()
+                    output = future.result()
+                    # 先补充新的输入，再把结果交给调用方，让执行和消费重叠
+                    _submit(1)
+                    yield index, output
+                else:
+                    # 等待任意一个调用完成
+                    done, _ = wait(
+                        [future for _, future in in_flight],
+                        return_when=FIRST_COMPLETED,
+                    )
+                    finished = [item for item in in_flight if item[1] in done]
+                    for item in finished:
+                        in_flight.remove(item)
+                    _submit(len(finished))
+                    for index, future in finished:
+                        yield index, future.result()
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        """
+        异步调用 Runnable
+
+        默认实现：把同步的 invoke 放到线程池中执行，避免阻塞事件循环。
+        有原生异步能力的子类应重写此方法。
+        :param input: 输入值
+        :param config: 可选的配置字典
+        :param kwargs: 额外的关键字参数
+        :return: 输出值
+        """
+        return await run_in_executor(None, self.invoke, input, config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs):
+        """
+        异步流式调用 Runnable
+
+        默认实现：先 await ainvoke，再按与 stream 相同的规则逐项 yield。
+        :param input: 输入值
+        :param config: 可选的配置字典
+        :param kwargs: 额外的关键字参数
+        :return: 异步生成器
+        """
+        result = await self.ainvoke(input, config=config, **kwargs)
+        if _is_streamable_result(result):
+            for item in result:
+                yield item
+        else:
+            yield result
+
+    async def abatch(
+        self, inputs: list, config=None, *, return_exceptions=False, **kwargs
+    ):
+        """
+        异步批量调用 Runnable
+
+        所有输入在同一个事件循环中并发执行，config 中的 max_concurrency 用于限制并发数。
+        :param inputs: 输入值列表
+        :param config: 可选的配置字典，或与输入等长的配置字典列表
+        :param return_exceptions: 为 True 时单个输入出错不会中断整批，异常对象放在对应位置返回
+        :param kwargs: 额外的关键字参数
+        :return: 输出值列表，顺序与输入一致
+        """
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        # 读取最大并发数，为空则不限制
+        max_concurrency = configs[0].get("max_concurrency")
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def _ainvoke_item(input_item, item_config):
+            try:
+                if semaphore is None:
+                    return await self.ainvoke(input_item, config=item_config, **kwargs)
+                async with semaphore:
+                    return await self.ainvoke(input_item, config=item_config, **kwargs)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        # gather 会保持结果顺序与输入顺序一致
+        return list(
+            await asyncio.gather(
+                *(
+                    _ainvoke_item(input_item, item_config)
+                    for input_item, item_config in zip(inputs, configs)
+                )
+            )
+        )
 
     #  定义管道操作每个子任务的cofig的配置
     def with_config(self, config=None, **kwargs):
@@ -77,10 +355,13 @@ class Runnable(ABC):
     def __or__(self, other):
         if not isinstance(other, Runnable):
             raise TypeError("管道右侧必须是Runnable实例")
+        # 右侧已经是链条时直接展开，避免产生嵌套的 RunnableSequence
+        if isinstance(other, RunnableSequence):
+            return RunnableSequence([self, *other.runnables])
         return RunnableSequence([self, other])
 
     def __repr__(self):
-        return
+        return f"{self.__class__.__name__}()"
 
     def with_retry(
         self,
@@ -88,6 +369,8 @@ class Runnable(ABC):
         stop_after_attempt=3,
         wait_exponential_jitter=True,
         exponential_jitter_params=None,
+        circuit_breaker=None,
+        retry_budget=None,
     ):
         return RunnableRetry(
             bound=self,
@@ -95,8 +378,109 @@ class Runnable(ABC):
             stop_after_attempt=stop_after_attempt,
             wait_exponential_jitter=wait_exponential_jitter,
             exponential_jitter_params=exponential_jitter_params,
+            circuit_breaker=circuit_breaker,
+            retry_budget=retry_budget,
+        )
+
+    def with_cache(self, backend=None, ttl=None, max_entries=None, namespace=None):
+        """
+        为当前 Runnable 增加结果缓存
+        :param backend: 缓存后端（InMemoryCache / SQLiteCache / DiskCache 或自定义 BaseCache），
+                        默认使用内存 LRU 缓存
+        :param ttl: 缓存条目的过期时间（秒），None 表示永不过期
+        :param max_entries: 默认内存缓存的最大条目数，传入 backend 时应在后端上设置
+        :param namespace: 缓存命名空间，默认根据当前 Runnable 的结构指纹生成
+        :return: RunnableCache
+        """
+        from .cache import InMemoryCache, RunnableCache
+
+        # 后端可能被多个链条共享，这里不修改它的容量
+        if backend is not None and max_entries is not None:
+            raise ValueError("max_entries 只用于默认缓存，请在 backend 上设置容量")
+        if backend is None:
+            backend = InMemoryCache(
+                max_entries=max_entries if max_entries is not None else 1024
+            )
+        return RunnableCache(bound=self, backend=backend, ttl=ttl, namespace=namespace)
+
+    def with_single_flight(self, key_func=None):
+        """
+        合并相同输入的并发调用，让它们共享同一次底层执行
+        :param key_func: 自定义键函数，默认使用输入和 configurable 配置的规范化哈希
+        :return: RunnableSingleFlight
+        """
+        from .single_flight import RunnableSingleFlight
+
+        return RunnableSingleFlight(bound=self, key_func=key_func)
+
+    def with_fallbacks(
+        self, fallbacks, *, exceptions_to_handle=(Exception,), hedge_after=None
+    ):
+        """
+        为当前 Runnable 增加备用方案
+        :param fallbacks: 备用 Runnable 列表，按顺序尝试
+        :param exceptions_to_handle: 触发回退的异常类型
+        :param hedge_after: 对冲延迟，秒数或 "p95"；主 Runnable 超过该时间未返回时
+                            并行调用备用 Runnable，先成功的结果胜出
+        :return: RunnableWithFallbacks
+        """
+        from .fallbacks import RunnableWithFallbacks
+
+        return RunnableWithFallbacks(
+            runnable=self,
+            fallbacks=fallbacks,
+            exceptions_to_handle=exceptions_to_handle,
+            hedge_after=hedge_after,
         )
 
+    def with_rate_limit(
+        self,
+        requests_per_second=None,
+        tokens_per_minute=None,
+        max_concurrent=None,
+        *,
+        rate_limiter=None,
+        token_counter=None,
+    ):
+        """
+        为当前 Runnable 增加限流和并发隔离
+        :param requests_per_second: 每秒允许的请求数
+        :param tokens_per_minute: 每分钟允许的 token 数
+        :param max_concurrent: 本 Runnable 的最大并发调用数
+        :param rate_limiter: 共享的 RateLimiter，传入时忽略 requests_per_second 和 tokens_per_minute；
+                             使用同一个 API key 的多个 Runnable 应共享同一个实例
+        :param token_counter: 估算输入 token 数的函数
+        :return: RunnableRateLimited
+        """
+        from .rate_limit import RateLimiter, RunnableRateLimited
+
+        if rate_limiter is None and (requests_per_second or tokens_per_minute):
+            rate_limiter = RateLimiter(requests_per_second, tokens_per_minute)
+        return RunnableRateLimited(
+            bound=self,
+            rate_limiter=rate_limiter,
+            max_concurrent=max_concurrent,
+            token_counter=token_counter,
+        )
+
+    def compile_graph(self):
+        """
+        编译为依赖图：展开嵌套的链条和并行结构，按数据依赖调度，
+        每个节点的依赖一完成就立即启动
+        :return: RunnableGraph，可通过 get_graph() 查看依赖图，
+                 通过 invoke_with_report() 获取本次调用的节点耗时
+        """
+        from .graph import compile_graph
+
+        return compile_graph(self)
+
+    def get_graph(self):
+        """
+        返回当前 Runnable 编译后的依赖图
+        :return: Graph
+        """
+        return self.compile_graph().get_graph()
+
 
 # 定义 RunnableSequence 类，用于实现可运行对象的链式组合（A | B | C 的效果）
 class RunnableSequence(Runnable):
@@ -110,13 +494,83 @@ class RunnableSequence(Runnable):
             if not isinstance(r, Runnable):
                 raise TypeError("runnables 需全部为 Runnable 实例")
         self.runnables = runnables
+        # 编译后的执行计划，首次调用时生成
+        self._plan = None
+        # 流式调用时开始按块传递的步骤下标，首次流式调用时计算
+        self._stream_start_index = None
 
     # 实现管道操作符 |，使链式拼接成立
     def __or__(self, other):
         # 右侧对象必须也是 Runnable 实例
         if not isinstance(other, Runnable):
             raise TypeError(f"管道右侧必须是一个Runnable实例")
-        return RunnableSequence(self.runnables[other])
+        # 拼接为一条扁平的链，而不是在链中嵌套链
+        if isinstance(other, RunnableSequence):
+            return RunnableSequence([*self.runnables, *other.runnables])
+        return RunnableSequence([*self.runnables, other])
+
+    def compile(self):
+        """
+        编译链条：展平嵌套的链，并融合相邻的纯函数步骤
+        :return: CompiledPlan，可通过 steps / describe() 查看实际执行的步骤
+        """
+        from .compiler import compile_sequence
+
+        if self._plan is None:
+            self._plan = compile_sequence(self)
+        return self._plan
+
+    # 流式调用的起点：最后一个"上一步不能按块还原"的步骤下标，
+    # 它之前的步骤直接 invoke，完整结果作为一个分块交给后续步骤
+    def _stream_start(self):
+        if self._stream_start_index is None:
+            start = 0
+            for index in range(1, len(self.runnables)):
+                if not self.runnables[index - 1]._streams_incrementally():
+                    start = index
+            self._stream_start_index = start
+        return self._stream_start_index
+
+    def _streams_incrementally(self):
+        return self.runnables[-1]._streams_incrementally()
+
+    # 选择本次调用实际执行的步骤
+    def _get_steps(self, callback_manager):
+        # 配置了回调时需要逐步上报事件，使用原始步骤；否则使用编译后的步骤
+        if not callback_manager.is_empty:
+            return self.runnables
+        return self.compile().steps
+
+    # 触发链开始回调，返回回调管理器和本次运行的 run_id
+    def _start_run(self, input, config, **kwargs):
+        callback_manager = CallbackManager.configure(config.get("callbacks"))
+        # 没有回调时走快速路径，不生成 run_id 也不构造事件参数
+        if callback_manager.is_empty:
+            return callback_manager, config.get("run_id")
+        # 序列化信息，用于回调上报链条标识
+        run_id = callback_manager.on_chain_start(
+            {"name": "RunnableSequence", "type": "chain"},
+            {"input": input},
+            run_id=config.get("run_id"),
+            parent_run_id=None,
+            tags=config.get("tags"),
+            metadata=config.get("metadata"),
+            **kwargs,
+        )
+        return callback_manager, run_id
+
+    # 为每个子步骤生成独立的 config，记录父子 run_id 关系
+    @staticmethod
+    def _child_config(config, run_id, callback_manager):
+        # 没有回调时子步骤不需要新的 run_id，只需去掉本链的 run_id
+        if callback_manager.is_empty:
+            if "run_id" not in config:
+                return config
+            return {k: v for k, v in config.items() if k != "run_id"}
+        child_config = config.copy()
+        child_config["run_id"] = uuid_module.uuid4()
+        child_config["parent_run_id"] = run_id
+        return child_config
 
     # 调用链的同步调用，将输入依次传过所有组件
     def invoke(self, input, config=None, **kwargs):
@@ -128,96 +582,471 @@ class RunnableSequence(Runnable):
         """
         # 确保config存在
         config = ensure_config(config)
-        # 处理回调如果有callbacks则触发链的开始回调
-        callbacks = config.get("callbacks")
-        callbacks_list = []
-        run_id = config.get("run_id")
-        if run_id is None:
-            run_id = uuid_module.uuid4()
-        if callbacks:
-            # 如果 callbacks 是列表，则直接赋值给 callback_list
-            if isinstance(callbacks, list):
-                callbacks_list = callbacks
-            else:
-                callbacks_list = [callbacks]
-        # 序列化信息，用于回调上报链条标识
-        serialized = {"name": "RunnableSequence", "type": "chain"}
-        # 遍历每个回调对象，触发其 on_chain_start 方法
-        for callback in callbacks_list:
-            # 只有回调对象有on_chain_start 属性才调用
-            if hasattr(callback, "on_chain_start"):
-                try:
-                    # 调用回调的 on_chain_start 方法，传入相关参数
-                    callback.on_chain_start(
-                        serialized,
-                        {"input": input},
-                        run_id=run_id,
-                        parent_run_id=None,
-                        tags=config.get("tags"),
-                        metadata=config.get("metadata"),
-                        **kwargs,
-                    )
-                except Exception:
-                    pass
+        callback_manager, run_id = self._start_run(input, config, **kwargs)
         # 初始化 value 为 input
         value = input
         try:
             # 依次调用每个 runnable 的 invoke，并传递最新的 value
-            for runnable in self.runnables:
-                child_config = config.copy()
-                child_run_id = uuid_module.uuid4()
-                child_config["run_id"] = child_run_id
-                child_config["parent_run_id"] = run_id
+            for runnable in self._get_steps(callback_manager):
+                # 预算已经用完时不再启动后续步骤
+                check_deadline(config)
+                child_config = self._child_config(config, run_id, callback_manager)
                 value = runnable.invoke(value, config=child_config, **kwargs)
         except Exception as e:
             # 若捕获到异常，则对所有回调触发 on_chain_error 并继续抛出异常
-            if callbacks_list:
-                for callback in callbacks_list:
-                    if hasattr(callback, "on_chain_error"):
-                        try:
-                            callback.on_chain_error(
-                                e, run_id=run_id, parent_run_id=None, **kwargs
-                            )
-                        except Exception:
-                            pass
+            callback_manager.on_chain_error(
+                e,
+                run_id=run_id,
+                parent_run_id=None,
+                **kwargs,
+            )
+            raise
+        # 如果没有异常执行，顺序触发所有回调的on_chain_end方法
+        callback_manager.on_chain_end(
+            outputs={"output": value},
+            run_id=run_id,
+            parent_run_id=None,
+            **kwargs,
+        )
+        return value
+
+    # 调用链的异步调用，每一步都 await 子组件的 ainvoke
+    async def ainvoke(self, input, config=None, **kwargs):
+        """
+        异步逐个执行链条：上一步输出作为下一步输入。
+        :param input: 输入值
+        :param config: 可选的配置字典
+        :param kwargs: 额外的关键字参数
+        :return: 最后一步的输出
+        """
+        config = ensure_config(config)
+        callback_manager, run_id = self._start_run(input, config, **kwargs)
+        value = input
+        try:
+            for runnable in self._get_steps(callback_manager):
+                child_config = self._child_config(config, run_id, callback_manager)
+                # 子步骤只能使用剩余的预算，超时后会被取消
+                value = await wait_for_deadline(
+                    runnable.ainvoke(value, config=child_config, **kwargs), config
+                )
+        except Exception as e:
+            callback_manager.on_chain_error(
+                e,
+                run_id=run_id,
+                parent_run_id=None,
+                **kwargs,
+            )
+            raise
+        callback_manager.on_chain_end(
+            outputs={"output": value},
+            run_id=run_id,
+            parent_run_id=None,
+            **kwargs,
+        )
+        return value
+
+    # 批量调用，输入为多个 input，结果为每个 input 执行完整链条的输出
+    def batch(
+        self,
+        inputs: list,
+        config=None,
+        *,
+        return_exceptions=False,
+        mode="item",
+        **kwargs,
+    ):
+        """
+        对输入列表批量执行同一条链。
+        :param inputs: 输入值列表
+        :param config: 可选的配置字典，或与输入等长的配置字典列表
+        :param return_exceptions: 为 True 时单个输入出错不会中断整批，异常对象放在对应位置返回
+        :param mode: 批量执行方式
+            - "item": 每个输入独立走完整条链，多个输入在线程池中并发
+            - "stage": 按步骤执行，每一步调用一次 batch 处理所有中间结果，
+              便于嵌入、向量检索等支持批量的步骤摊薄单次调用的开销
+            - "pipeline": 流水线执行，每个步骤有自己的工作线程，步骤之间用有界队列连接，
+              第 i 个输入在调用大模型时，第 i+1 个输入已经可以开始格式化
+        :param kwargs: 额外的关键字参数；pipeline 模式下还支持
+            - stage_concurrency: 每个步骤的工作线程数，可以是整数或与步骤数等长的列表，默认 1
+            - queue_size: 步骤之间队列的容量，队列满时上游步骤会阻塞等待，默认为最大线程数的 2 倍
+        :return: 输出值列表
+        """
+        if mode == "item":
+            return super().batch(
+                inputs, config=config, return_exceptions=return_exceptions, **kwargs
+            )
+        if mode == "stage":
+            return self._batch_by_stage(
+                inputs, config, return_exceptions=return_exceptions, **kwargs
+            )
+        if mode == "pipeline":
+            return self._batch_pipelined(
+                inputs, config, return_exceptions=return_exceptions, **kwargs
+            )
+        raise ValueError(f"不支持的批量执行方式: {mode}")
+
+    # 按步骤批量执行：第 i 步处理完所有输入后，再把结果整体交给第 i+1 步
+    def _batch_by_stage(self, inputs, config, *, return_exceptions=False, **kwargs):
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        # 每个输入仍然是一次独立的链运行，分别触发开始回调
+        runs = [
+            self._start_run(input_item, item_config, **kwargs)
+            for input_item, item_config in zip(inputs, configs)
+        ]
+        values = list(inputs)
+        # 记录已经失败的输入下标及其异常，失败的输入不再进入后续步骤
+        failed = {}
+        try:
+            for runnable in self.runnables:
+                pending = []
+                for i in range(len(values)):
+                    if i in failed:
+                        continue
+                    try:
+                        check_deadline(configs[i])
+                    except DeadlineExceededError as e:
+                        if not return_exceptions:
+                            raise
+                        failed[i] = e
+                        continue
+                    pending.append(i)
+                if not pending:
+                    break
+                step_configs = [
+                    self._child_config(configs[i], runs[i][1], runs[i][0])
+                    for i in pending
+                ]
+                outputs = runnable.batch(
+                    [values[i] for i in pending],
+                    config=step_configs,
+                    return_exceptions=return_exceptions,
+                    **kwargs,
+                )
+                for i, output in zip(pending, outputs):
+                    if return_exceptions and isinstance(output, Exception):
+                        failed[i] = output
+                    else:
+                        values[i] = output
+        except Exception as e:
+            # 不返回异常时，整批失败，所有输入都触发错误回调
+            self._fail_batch_runs(runs, e, **kwargs)
             raise
+        return self._finish_batch_runs(runs, values, failed, **kwargs)
+
+    # 流水线批量执行：每个步骤一组工作线程，步骤之间通过有界队列传递中间结果
+    def _batch_pipelined(
+        self,
+        inputs,
+        config,
+        *,
+        return_exceptions=False,
+        stage_concurrency=1,
+        queue_size=None,
+        **kwargs,
+    ):
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        stage_count = len(self.runnables)
+        # 规范化每个步骤的并发数
+        if isinstance(stage_concurrency, int):
+            concurrency = [stage_concurrency] * stage_count
         else:
-            # 如果没有异常执行，顺序触发所有回调的on_chain_end方法
-            if callbacks_list:
-                for callback in callbacks_list:
-                    if hasattr(callback, "on_chain_end"):
+            concurrency = list(stage_concurrency)
+            if len(concurrency) != stage_count:
+                raise ValueError(
+                    f"stage_concurrency 长度 {len(concurrency)} 与步骤数 {stage_count} 不一致"
+                )
+        if any(c < 1 for c in concurrency):
+            raise ValueError("stage_concurrency 必须大于等于 1")
+        queue_size = queue_size or max(concurrency) * 2
+        # queues[i] 是第 i 个步骤的输入队列，最后一个队列收集最终结果
+        queues = [queue.Queue(maxsize=queue_size) for _ in range(stage_count)]
+        queues.append(queue.Queue())
+        runs = [
+            self._start_run(input_item, item_config, **kwargs)
+            for input_item, item_config in zip(inputs, configs)
+        ]
+        # 队列结束标记
+        sentinel = object()
+        # 不返回异常时，任意输入出错都会置位，通知所有线程尽快停止
+        stop = threading.Event()
+        errors = []
+        # 工作线程中出现的 BaseException（如 SystemExit），交回调用线程重新抛出
+        fatal = []
+        # 每个步骤还在运行的工作线程数，最后一个退出的线程负责通知下游结束
+        alive = list(concurrency)
+        alive_lock = threading.Lock()
+
+        # 把输入依次放入第一个队列，队列满时阻塞，形成背压
+        def _feed():
+            try:
+                for index, input_item in enumerate(inputs):
+                    if stop.is_set():
+                        break
+                    queues[0].put((index, input_item, None))
+            finally:
+                queues[0].put(sentinel)
+
+        # 第 stage 个步骤的工作线程
+        def _work(stage):
+            runnable = self.runnables[stage]
+            in_queue, out_queue = queues[stage], queues[stage + 1]
+            try:
+                while True:
+                    item = in_queue.get()
+                    if item is sentinel:
+                        # 把结束标记放回去，让同一步骤的其它线程也能退出
+                        in_queue.put(sentinel)
+                        return
+                    index, value, error = item
+                    # 之前步骤已经失败的输入直接向下游传递，不再执行
+                    if error is None and not stop.is_set():
                         try:
-                            callback.on_chain_end(
-                                outputs={"output": value},
-                                run_id=run_id,
-                                parent_run_id=None,
+                            check_deadline(configs[index])
+                            value = runnable.invoke(
+                                value,
+                                config=self._child_config(
+                                    configs[index], runs[index][1], runs[index][0]
+                                ),
                                 **kwargs,
                             )
-                        except Exception:
-                            pass
-        return value
+                        except Exception as e:
+                            error = e
+                            if not return_exceptions:
+                                errors.append(e)
+                                stop.set()
+                        except BaseException as e:
+                            # 不能当作单个输入的失败返回，整批停止后由调用线程抛出；
+                            # 线程继续消费队列直到结束标记，上游不会因背压卡住
+                            fatal.append(e)
+                            stop.set()
+                    # 整批已经失败时丢弃剩余输入
+                    if stop.is_set():
+                        continue
+                    out_queue.put((index, value, error))
+            finally:
+                # 无论线程如何退出都要交接结束标记，否则收集结果的调用线程会一直等待
+                with alive_lock:
+                    alive[stage] -= 1
+                    is_last = alive[stage] == 0
+                if is_last:
+                    out_queue.put(sentinel)
 
-    # 批量调用，输入为多个 input，结果为每个 input 执行完整链条的输出
-    def batch(self, inputs: list, config=None, **kwargs):
-        """对输入列表逐项执行同一条链。"""
-        # 逐项调用invoke,收集所有
-        return [self.invoke(item, config=None, **kwargs) for item in inputs]
+        threads = [
+            threading.Thread(target=contextvars.copy_context().run, args=(_feed,))
+        ]
+        for stage, count in enumerate(concurrency):
+            for _ in range(count):
+                threads.append(
+                    threading.Thread(
+                        target=contextvars.copy_context().run, args=(_work, stage)
+                    )
+                )
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        values = list(inputs)
+        failed = {}
+        # 在当前线程收集最后一个步骤的输出
+        while True:
+            item = queues[-1].get()
+            if item is sentinel:
+                break
+            index, value, error = item
+            if error is not None:
+                failed[index] = error
+            else:
+                values[index] = value
+        for thread in threads:
+            thread.join()
+        if fatal:
+            self._fail_batch_runs(runs, fatal[0], **kwargs)
+            raise fatal[0]
+        if errors:
+            self._fail_batch_runs(runs, errors[0], **kwargs)
+            raise errors[0]
+        return self._finish_batch_runs(runs, values, failed, **kwargs)
+
+    # 整批失败时，所有输入都触发错误回调
+    @staticmethod
+    def _fail_batch_runs(runs, error, **kwargs):
+        for callback_manager, run_id in runs:
+            callback_manager.on_chain_error(
+                error,
+                run_id=run_id,
+                parent_run_id=None,
+                **kwargs,
+            )
+
+    # 批量执行结束后，按输入顺序触发回调并整理结果，失败的输入返回其异常
+    @staticmethod
+    def _finish_batch_runs(runs, values, failed, **kwargs):
+        results = []
+        for i, (callback_manager, run_id) in enumerate(runs):
+            if i in failed:
+                callback_manager.on_chain_error(
+                    failed[i],
+                    run_id=run_id,
+                    parent_run_id=None,
+                    **kwargs,
+                )
+                results.append(failed[i])
+            else:
+                callback_manager.on_chain_end(
+                    outputs={"output": values[i]},
+                    run_id=run_id,
+                    parent_run_id=None,
+                    **kwargs,
+                )
+                results.append(values[i])
+        return results
 
-    # 流式调用，默认复用基类逻辑
+    # 流式调用，每一步通过 transform 消费上一步的分块，首个分块可以尽早到达调用方
     def stream(self, input, config=None, **kwargs):
         """
-        流式执行：沿用基类逻辑，对最终结果做流式分发。
+        流式执行：把各步骤的 transform 串成一条流水线，
+        上一步一产出分块，下一步就可以开始处理。
         :param input:
         :param kwargs:
         :return:
         """
-        yield from super().stream(input, config=None, **kwargs)
+        config = ensure_config(config)
+        callback_manager, run_id = self._start_run(input, config, **kwargs)
+        start = self._stream_start()
+        # 记录最终输出，用于结束回调
+        final = None
+        try:
+            # 起点之前的步骤逐个 invoke，避免把展开后的列表等分块错误地拼接
+            value = input
+            for runnable in self.runnables[:start]:
+                check_deadline(config)
+                value = runnable.invoke(
+                    value,
+                    config=self._child_config(config, run_id, callback_manager),
+                    **kwargs,
+                )
+            # 起点步骤的上游只有一个分块，即完整的输入
+            iterator = iter([value])
+            for runnable in self.runnables[start:]:
+                iterator = runnable.transform(
+                    iterator,
+                    config=self._child_config(config, run_id, callback_manager),
+                    **kwargs,
+                )
+            check_deadline(config)
+            for chunk in iterator:
+                yield chunk
+                final = _add_chunks(final, chunk)
+                check_deadline(config)
+        except Exception as e:
+            callback_manager.on_chain_error(
+                e,
+                run_id=run_id,
+                parent_run_id=None,
+                **kwargs,
+            )
+            raise
+        callback_manager.on_chain_end(
+            outputs={"output": final},
+            run_id=run_id,
+            parent_run_id=None,
+            **kwargs,
+        )
+
+    # 异步流式调用，每一步通过 atransform 消费上一步的分块
+    async def astream(self, input, config=None, **kwargs):
+        """
+        异步流式执行：把各步骤的 atransform 串成一条流水线。
+        :param input: 输入值
+        :param config: 可选的配置字典
+        :param kwargs: 额外的关键字参数
+        :return: 异步生成器
+        """
+        config = ensure_config(config)
+        callback_manager, run_id = self._start_run(input, config, **kwargs)
+        start = self._stream_start()
+
+        async def _input_aiterator(value):
+            yield value
+
+        final = None
+        try:
+            value = input
+            for runnable in self.runnables[:start]:
+                child_config = self._child_config(config, run_id, callback_manager)
+                value = await wait_for_deadline(
+                    runnable.ainvoke(value, config=child_config, **kwargs), config
+                )
+            iterator = _input_aiterator(value)
+            for runnable in self.runnables[start:]:
+                iterator = runnable.atransform(
+                    iterator,
+                    config=self._child_config(config, run_id, callback_manager),
+                    **kwargs,
+                )
+            check_deadline(config)
+            async for chunk in iterator:
+                yield chunk
+                final = _add_chunks(final, chunk)
+                check_deadline(config)
+        except Exception as e:
+            callback_manager.on_chain_error(
+                e,
+                run_id=run_id,
+                parent_run_id=None,
+                **kwargs,
+            )
+            raise
+        callback_manager.on_chain_end(
+            outputs={"output": final},
+            run_id=run_id,
+            parent_run_id=None,
+            **kwargs,
+        )
+
+    # 流式转换：把上游分块依次送入整条链
+    def transform(self, input_iterator, config=None, **kwargs):
+        config = ensure_config(config)
+        start = self._stream_start()
+        iterator = input_iterator
+        if start:
+            value = _collect_chunks(input_iterator)
+            for runnable in self.runnables[:start]:
+                value = runnable.invoke(value, config=config.copy(), **kwargs)
+            iterator = iter([value])
+        for runnable in self.runnables[start:]:
+            iterator = runnable.transform(iterator, config=config.copy(), **kwargs)
+        yield from iterator
+
+    async def atransform(self, input_aiterator, config=None, **kwargs):
+        config = ensure_config(config)
+        start = self._stream_start()
+        iterator = input_aiterator
+        if start:
+            value = await _acollect_chunks(input_aiterator)
+            for runnable in self.runnables[:start]:
+                value = await runnable.ainvoke(value, config=config.copy(), **kwargs)
+
+            async def _value_aiterator():
+                yield value
+
+            iterator = _value_aiterator()
+        for runnable in self.runnables[start:]:
+            iterator = runnable.atransform(iterator, config=config.copy(), **kwargs)
+        async for chunk in iterator:
+            yield chunk
 
     # 定义字符串表示，便于调试，输出链路结构
     def __repr__(self) -> str:
         names = " | ".join(
             getattr(r, "name", r.__class__.__name__) for r in self.runnables
         )
+        return f"RunnableSequence({names})"
 
 
 class RunnableRetry(Runnable):
@@ -228,47 +1057,141 @@ class RunnableRetry(Runnable):
         stop_after_attempt=3,
         wait_exponential_jitter=True,
         exponential_jitter_params=None,
+        circuit_breaker=None,
+        retry_budget=None,
     ):
+        """
+        初始化重试包装
+        :param bound: 被包装的可运行对象
+        :param retry_if_exception_type: 需要重试的异常类型
+        :param stop_after_attempt: 最多尝试的次数（包括第一次调用）
+        :param wait_exponential_jitter: 是否使用带抖动的指数回退
+        :param exponential_jitter_params: 回退参数 initial / max_wait / exp_base / jitter
+        :param circuit_breaker: 可选的 CircuitBreaker，可在多个 Runnable 之间共享
+        :param retry_budget: 可选的 RetryBudget，限制进程内的重试总量
+        """
         self.bound = bound
         self.retry_if_exception_type = retry_if_exception_type
         self.stop_after_attempt = stop_after_attempt
         self.wait_exponential_jitter = wait_exponential_jitter
         self.exponential_jitter_params = exponential_jitter_params or {}
+        self.circuit_breaker = circuit_breaker
+        self.retry_budget = retry_budget
 
-    def invoke(self, input, config=None, **kwargs):
-        # 记录最后一次抛出异常
-        last_exception = None
-        # 初始延迟
-        initial = self.exponential_jitter_params.get("initial", 0)
+    # 计算第 attempt 次失败后需要等待的秒数
+    def _get_delay(self, attempt):
+        # 如果不启用指数回退，则固定等待初始延迟（默认不等待）
+        if not self.wait_exponential_jitter:
+            return self.exponential_jitter_params.get("initial", 0)
+        # 初始延迟，默认 1 秒，否则指数回退的结果始终为 0
+        initial = self.exponential_jitter_params.get("initial", 1.0)
         # 最大延迟
         max_wait = self.exponential_jitter_params.get("max_wait", 10.0)
         # 幂指数基数
         exp_base = self.exponential_jitter_params.get("exp_base", 2.0)
         # 抖动范围
-        jitter = self.exponential_jitter_params.get("jitter", 0.0)
+        jitter = self.exponential_jitter_params.get("jitter", 1.0)
+        # 计算当前的延迟时间
+        delay = min(max_wait, initial * (exp_base ** (attempt - 1)))
+        # 如果配置了jitter,叠加一个随即抖动，jitter的中文含义就是抖动
+        if jitter > 0:
+            delay += random.uniform(0, jitter)
+        return delay
+
+    # 重试前的等待时间不超过剩余预算，预算用完后下一次尝试会直接失败
+    def _get_wait(self, attempt, config):
+        delay = self._get_delay(attempt)
+        remaining = get_remaining_time(config)
+        if remaining is not None:
+            delay = max(0.0, min(delay, remaining))
+        return delay
+
+    # 每次尝试之前调用：预算用完时抛出 DeadlineExceededError，
+    # 熔断器打开时抛出 CircuitOpenError，直接快速失败；返回熔断器的探测凭据
+    def _before_attempt(self, attempt, config):
+        check_deadline(config)
+        probe = None
+        if self.circuit_breaker is not None:
+            probe = self.circuit_breaker.before_call()
+        if attempt == 1 and self.retry_budget is not None:
+            self.retry_budget.record_request()
+        return probe
+
+    # 尝试被取消或中断时没有结果，归还熔断器的探测名额
+    def _release_probe(self, probe):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.release_probe(probe)
+
+    # 处理一次可重试的失败，返回是否还应该继续重试
+    def _should_retry(self, attempt):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_failure()
+        if attempt >= self.stop_after_attempt:
+            return False
+        # 重试预算耗尽时放弃剩余的重试
+        if self.retry_budget is not None:
+            return self.retry_budget.try_acquire_retry()
+        return True
 
-        for attempt in range(1, self.stop_after_attempt, 1):
+    def _record_success(self):
+        # 不在重试范围内的异常说明下游有响应，同样按成功计入熔断器
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+
+    def invoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        attempt = 1
+        while True:
+            probe = self._before_attempt(attempt, config)
             try:
-                return self.bound.invoke(input, config=None, **kwargs)
-            except self.retry_if_exception_type as error:
-                # 保存本次捕获的异常
-                last_exception = error
-                # 如果还没有到达最大重试次数
-                if attempt < self.stop_after_attempt:
-                    # 如果要启动指数回退
-                    if self.wait_exponential_jitter:
-                        # 计算当前的延迟时间
-                        delay = min(max_wait, initial * (exp_base ** (attempt - 1)))
-                        # 如果配置了jitter,叠加一个随即抖动，jitter的中文含义就是抖动
-                        if jitter > 0:
-                            delay = random.uniform(0, jitter)
-                    else:
-                        delay = initial
-                        time.sleep(delay)
-                        # 如果抛出的是不会重试范围内的异常，则直接抛出
+                output = self.bound.invoke(input, config=config, **kwargs)
+            except DeadlineExceededError:
+                # 预算用完或调用被取消，重试也不会成功；这不是下游故障，不计入熔断器和重试预算
+                self._release_probe(probe)
+                raise
+            except self.retry_if_exception_type:
+                if not self._should_retry(attempt):
+                    raise
+            except Exception:
+                # 不在重试范围内的异常会直接向上抛出
+                self._record_success()
+                raise
+            except BaseException:
+                self._release_probe(probe)
+                raise
+            else:
+                self._record_success()
+                return output
+            # 等待后重试
+            time.sleep(self._get_wait(attempt, config))
+            attempt += 1
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        attempt = 1
+        while True:
+            probe = self._before_attempt(attempt, config)
+            try:
+                output = await self.bound.ainvoke(input, config=config, **kwargs)
+            except DeadlineExceededError:
+                self._release_probe(probe)
+                raise
+            except self.retry_if_exception_type:
+                if not self._should_retry(attempt):
+                    raise
             except Exception:
+                self._record_success()
+                raise
+            except BaseException:
+                # 被 wait_for_deadline、对冲请求或 task.cancel() 取消
+                self._release_probe(probe)
                 raise
-        raise last_exception
+            else:
+                self._record_success()
+                return output
+            # 使用 asyncio.sleep 等待，不阻塞事件循环
+            await asyncio.sleep(self._get_wait(attempt, config))
+            attempt += 1
 
 
 class RunnableBinding(Runnable):
@@ -303,23 +1226,35 @@ class RunnableBinding(Runnable):
         merged_kwargs = {**self.kwargs, **kwargs}
         return self.bound.invoke(input, config=merged_config, **merged_kwargs)
 
-    def batch(self, inputs, config=None, **kwargs):
+    # 合并绑定的配置和批量调用传入的配置，config 可以是单个字典或字典列表
+    def _merge_batch_config(self, config):
+        if isinstance(config, (list, tuple)):
+            return [_merge_configs(self.config, c) for c in config]
+        return _merge_configs(self.config, config)
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
         """
         批量调用绑定的 Runnable，合并配置
 
         Args:
             inputs: 输入值列表
-            config: 可选的配置字典，会与绑定的配置合并
+            config: 可选的配置字典或配置字典列表，会与绑定的配置合并
+            return_exceptions: 为 True 时把单个输入的异常放在结果中返回
             **kwargs: 额外的关键字参数
         Returns:
             输出值列表
         """
         # 合并绑定的配置和传入的配置
-        merged_config = _merge_configs(self.config, config)
+        merged_config = self._merge_batch_config(config)
         # 合并关键字参数
         merged_kwargs = {**self.kwargs, **kwargs}
         # 调用底层 Runnable
-        return self.bound.batch(inputs, config=merged_config, **merged_kwargs)
+        return self.bound.batch(
+            inputs,
+            config=merged_config,
+            return_exceptions=return_exceptions,
+            **merged_kwargs,
+        )
 
     def stream(self, input, config=None, **kwargs):
         """
@@ -338,6 +1273,75 @@ class RunnableBinding(Runnable):
         # 调用底层 Runnable
         yield from self.bound.stream(input, config=merged_config, **merged_kwargs)
 
+    async def ainvoke(self, input, config=None, **kwargs):
+        """
+        异步调用绑定的 Runnable，合并配置
+        :param input: 输入值
+        :param config: 可选的配置字典，会与绑定的配置合并
+        :param kwargs: 额外的关键字参数
+        :return:
+        """
+        merged_config = _merge_configs(self.config, config)
+        merged_kwargs = {**self.kwargs, **kwargs}
+        return await self.bound.ainvoke(input, config=merged_config, **merged_kwargs)
+
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        """
+        异步批量调用绑定的 Runnable，合并配置
+        :param inputs: 输入值列表
+        :param config: 可选的配置字典或配置字典列表，会与绑定的配置合并
+        :param return_exceptions: 为 True 时把单个输入的异常放在结果中返回
+        :param kwargs: 额外的关键字参数
+        :return: 输出值列表
+        """
+        merged_config = self._merge_batch_config(config)
+        merged_kwargs = {**self.kwargs, **kwargs}
+        return await self.bound.abatch(
+            inputs,
+            config=merged_config,
+            return_exceptions=return_exceptions,
+            **merged_kwargs,
+        )
+
+    async def astream(self, input, config=None, **kwargs):
+        """
+        异步流式调用绑定的 Runnable，合并配置
+        :param input: 输入值
+        :param config: 可选的配置字典，会与绑定的配置合并
+        :param kwargs: 额外的关键字参数
+        :return: 底层 Runnable 的异步流式输出
+        """
+        merged_config = _merge_configs(self.config, config)
+        merged_kwargs = {**self.kwargs, **kwargs}
+        async for chunk in self.bound.astream(
+            input, config=merged_config, **merged_kwargs
+        ):
+            yield chunk
+
+    def transform(self, input_iterator, config=None, **kwargs):
+        """
+        流式转换，合并配置后交给底层 Runnable
+        """
+        merged_config = _merge_configs(self.config, config)
+        merged_kwargs = {**self.kwargs, **kwargs}
+        yield from self.bound.transform(
+            input_iterator, config=merged_config, **merged_kwargs
+        )
+
+    async def atransform(self, input_aiterator, config=None, **kwargs):
+        """
+        异步流式转换，合并配置后交给底层 Runnable
+        """
+        merged_config = _merge_configs(self.config, config)
+        merged_kwargs = {**self.kwargs, **kwargs}
+        async for chunk in self.bound.atransform(
+            input_aiterator, config=merged_config, **merged_kwargs
+        ):
+            yield chunk
+
+    def _streams_incrementally(self):
+        return self.bound._streams_incrementally()
+
     def __repr__(self):
         """返回对象的字符串表示"""
         return f"RunnableBinding(bound={self.bound}, config={self.config})"
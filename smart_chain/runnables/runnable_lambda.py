@@ -1,8 +1,29 @@
-from gc import callbacks
+import inspect
+import os
+import pickle
 
-from .runnable import Runnable
-from ..config import ensure_config, _accept_config
-import uuid as uuid_module
+from .runnable import Runnable, _add_chunks, _aiter_in_executor
+from .process_pool import iter_process_chunks, run_in_process_pool
+from ..callbacks import CallbackManager
+from ..config import ensure_config, _accept_config, get_config_list, run_in_executor
+
+# 被包装函数的种类
+SYNC = "sync"
+ASYNC = "async"
+GENERATOR = "generator"
+ASYNC_GENERATOR = "async_generator"
+
+
+# 判断函数的种类，同时考虑实现了 __call__ 的可调用对象
+def _get_func_kind(func):
+    candidates = (func, getattr(func, "__call__", None))
+    if any(inspect.isasyncgenfunction(f) for f in candidates):
+        return ASYNC_GENERATOR
+    if any(inspect.iscoroutinefunction(f) for f in candidates):
+        return ASYNC
+    if any(inspect.isgeneratorfunction(f) for f in candidates):
+        return GENERATOR
+    return SYNC
 
 
 # 定义 RunnableLambda 类，用于将普通 Python 函数封装为 Runnable 对象
@@ -20,19 +41,48 @@ class RunnableLambda(Runnable):
         runnable = RunnableLambda(add_one)
         result = runnable.invoke(5)  # 返回 6
         results = runnable.batch([1, 2, 3])  # 返回 [2, 3, 4]
+
+    也可以包装 async def 定义的协程函数，此时需要通过 ainvoke/abatch/astream 调用。
+    生成器函数（包括异步生成器）在 stream/astream 中逐块输出，在 invoke 中返回合并后的结果。
+
+    CPU 密集的函数可以使用 executor="process"，batch/batch_iter 会在进程池中执行，
+    不受 GIL 限制：
+        runnable = RunnableLambda(segment, executor="process", workers=4)
     """
 
-    def __init__(self, func, name: str | None = None):
+    def __init__(
+        self,
+        func,
+        name: str | None = None,
+        executor: str = "thread",
+        workers: int | None = None,
+        chunksize: int | None = None,
+    ):
         """
         初始化RunnableLambda
         :param func: 要包装的函数
         :param name: Runnable的名称，可选，默认使用函数名
+        :param executor: 批量调用的执行方式，"thread" 使用线程池，"process" 使用进程池
+        :param workers: 进程池的进程数，None 表示使用 CPU 核数
+        :param chunksize: 进程池模式下每个任务包含的输入个数，None 表示自动计算
         """
         # 检查传入的func是否可为可调用对象
         if not callable(func):
             raise TypeError(f"func 必须是可调用对象，但得到了 {type(func)}")
+        if executor not in ("thread", "process"):
+            raise ValueError(f"不支持的 executor: {executor!r}")
         # 保存待封装的函数
         self.func = func
+        # 构造时一次性分析函数，调用时不再重复检查签名
+        # 函数种类：同步函数、协程函数、生成器函数或异步生成器函数
+        self._kind = _get_func_kind(func)
+        # 是否为需要在事件循环中执行的异步函数
+        self._is_async = self._kind in (ASYNC, ASYNC_GENERATOR)
+        # 被包装的函数是否接收 config 参数
+        self._accepts_config = _accept_config(func)
+        self.executor = executor
+        self.workers = workers
+        self.chunksize = chunksize
         # 如果传入了name，那么则使用
         if name is not None:
             self.name = name
@@ -42,6 +92,38 @@ class RunnableLambda(Runnable):
                 self.name = func.__name__ if func.__name__ != "<lambda>" else "lambda"
             except AttributeError:
                 self.name = "runnable"
+        # 进程池模式在构造时就检查函数能否在子进程中执行，尽早报错
+        if executor == "process":
+            self._check_process_safe()
+
+    # 进程池模式要求函数可以被 pickle，且不依赖只在当前进程中有效的 config
+    def _check_process_safe(self):
+        if self._kind != SYNC or self._accepts_config:
+            raise ValueError(
+                f"{self.name} 不能在进程池中执行：只支持不接收 config 的普通同步函数"
+            )
+        try:
+            pickle.dumps(self.func)
+        except Exception as e:
+            raise TypeError(
+                f"{self.name} 无法被 pickle，进程池模式需要使用模块级定义的函数"
+            ) from e
+
+    def with_executor(self, executor="process", workers=None, chunksize=None):
+        """
+        返回使用指定执行方式的新 RunnableLambda
+        :param executor: "thread" 或 "process"
+        :param workers: 进程池的进程数
+        :param chunksize: 进程池模式下每个任务包含的输入个数
+        :return: RunnableLambda
+        """
+        return RunnableLambda(
+            self.func,
+            name=self.name,
+            executor=executor,
+            workers=workers,
+            chunksize=chunksize,
+        )
 
     # 实现 innvoke,同步调用底层函数
     def invoke(self, input, config=None, **kwargs):
@@ -52,103 +134,287 @@ class RunnableLambda(Runnable):
         :param kwargs: 额外的关键字参数
         :return:
         """
-        # 保证 config 不为 None，如为 None 则转为空字典
-        config = ensure_config(config)
-        # 从配置字典中获取回调对象
-        callbacks = config.get("callbacks")
-        # 初始化回调对象列表
-        callback_list = []
-        # 获取当前调用的唯一 ID(run_id)
-        run_id = config.get("run_id")
-        # 如果没有传入 run_id, 则自动生成一个新的uuid
-        if run_id is None:
-            run_id = uuid_module.uuid4()
-        # 如果 callbacks 不为空
-        if callbacks:
-            # 如果 callbacks 已经是列表，则直接用，否则转为单元素列表
-            if isinstance(callbacks, list):
-                callback_list = callbacks
-            else:
-                callback_list = [callbacks]
-        # 构造序列化信息，用于回调上报链条标识
-        serialized = {"name": self.name, "type": "RunnableLambda"}
-        # 遍历每个回调对象，触发其 on_chain_start 方法
-        for callback in callback_list:
-            # 只有回调对象有 on_chain_start 属性才调用
-            if hasattr(callback, "on_chain_start"):
-                try:
-                    # 调用回调的 on_chain_start 方法，传入相关参数
-                    callback.on_chain_start(
-                        serialized=serialized,
-                        inputs={"input": input},
-                        run_id=run_id,
-                        parent_run_id=None,
-                        tags=config.get("tags"),
-                        metadata=config.get("metadata"),
-                        **kwargs,
-                    )
-                except Exception:
-                    # 回调过程中如出现异常则忽略，确保主流程不会终止
-                    pass
-        # 检查被包装的函数是否能够接收config参数
-        if _accept_config(self.func):
-            kwargs["config"] = config
+        # 协程函数无法在同步调用中执行
+        if self._is_async:
+            raise TypeError(
+                f"{self.name} 是协程函数，请使用 ainvoke/abatch/astream 调用"
+            )
+        config, callback_manager, run_id, call_kwargs = self._start_run(
+            input, config, **kwargs
+        )
         try:
             # 正常调用被 包装的函数，将input作为第一个参数，kwargs作为关键字参数字典
-            output = self.func(input, **kwargs)
+            output = self.func(input, **call_kwargs)
+            # 生成器函数：合并所有分块作为结果
+            if self._kind == GENERATOR:
+                final = None
+                for chunk in output:
+                    final = _add_chunks(final, chunk)
+                output = final
         except Exception as e:
-            if callback_list:
-                for callback in callback_list:
-                    if hasattr(callback, "on_chain_error"):
-                        try:
-                            callback.on_chain_error(
-                                error=e,
-                                run_id=run_id,
-                                parent_run_id=None,
-                                **kwargs,
-                            )
-                        except Exception:
-                            pass
+            self._on_error(callback_manager, e, run_id, **kwargs)
             raise
-        if callback_list:
-            for callback in callback_list:
-                if hasattr(callback, "on_chain_end"):
-                    try:
-                        callback.on_chain_end(
-                            outputs={"output": output},
-                            run_id=run_id,
-                            parent_run_id=None,
-                            **kwargs,
-                        )
-                    except Exception:
-                        pass
+        self._on_end(callback_manager, output, run_id, **kwargs)
         return output
 
-    # 批量调用内部依然使用invoke，保证与Runnable基本一致
-    def batch(self, inputs: list, config=None, **kwargs) -> list:
+    # 异步调用：协程函数直接 await，普通函数放到线程池中执行
+    async def ainvoke(self, input, config=None, **kwargs):
         """
-        批量调用包装的函数
-        :param inputs:输入值列表
-        :param kwargs:额外的关键字参数
+        异步调用包装的函数
+        :param input: 输入值
+        :param config: 可选的配置字典
+        :param kwargs: 额外的关键字参数
         :return:
-            输出值列表
         """
-        # 调用 invoke 实现批量处理
-        return [self.invoke(input_item, config=None, **kwargs) for input_item in inputs]
+        if not self._is_async:
+            return await super().ainvoke(input, config=config, **kwargs)
+        config, callback_manager, run_id, call_kwargs = self._start_run(
+            input, config, **kwargs
+        )
+        try:
+            if self._kind == ASYNC_GENERATOR:
+                output = None
+                async for chunk in self.func(input, **call_kwargs):
+                    output = _add_chunks(output, chunk)
+            else:
+                output = await self.func(input, **call_kwargs)
+        except Exception as e:
+            self._on_error(callback_manager, e, run_id, **kwargs)
+            raise
+        self._on_end(callback_manager, output, run_id, **kwargs)
+        return output
+
+    # 触发开始回调，并准备调用被包装函数时使用的关键字参数
+    def _start_run(self, input, config, **kwargs):
+        # 保证 config 不为 None，如为 None 则转为空字典
+        config = ensure_config(config)
+        # 根据配置中的回调得到回调管理器
+        callback_manager = CallbackManager.configure(config.get("callbacks"))
+        # 获取当前调用的唯一 ID(run_id)，只有存在回调时才会自动生成
+        run_id = config.get("run_id")
+        if not callback_manager.is_empty:
+            run_id = callback_manager.on_chain_start(
+                serialized={"name": self.name, "type": "RunnableLambda"},
+                inputs={"input": input},
+                run_id=run_id,
+                parent_run_id=None,
+                tags=config.get("tags"),
+                metadata=config.get("metadata"),
+                **kwargs,
+            )
+        call_kwargs = dict(kwargs)
+        # 被包装的函数能够接收config参数时传入
+        if self._accepts_config:
+            call_kwargs["config"] = config
+        return config, callback_manager, run_id, call_kwargs
+
+    # 触发错误回调
+    @staticmethod
+    def _on_error(callback_manager, error, run_id, **kwargs):
+        callback_manager.on_chain_error(
+            error=error,
+            run_id=run_id,
+            parent_run_id=None,
+            **kwargs,
+        )
+
+    # 触发结束回调
+    @staticmethod
+    def _on_end(callback_manager, output, run_id, **kwargs):
+        callback_manager.on_chain_end(
+            outputs={"output": output},
+            run_id=run_id,
+            parent_run_id=None,
+            **kwargs,
+        )
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        """
+        批量调用包装的函数
+
+        线程池模式使用基类实现；进程池模式把输入分块提交到进程池，结果顺序与输入一致，
+        回调在当前进程中触发。
+        :param inputs: 输入值列表
+        :param config: 可选的配置字典，或与输入等长的配置字典列表
+        :param return_exceptions: 为 True 时单个输入出错不会中断整批
+        :param kwargs: 额外的关键字参数，进程池模式下需要可以被 pickle
+        :return: 输出值列表
+        """
+        if self.executor != "process":
+            return super().batch(
+                inputs, config, return_exceptions=return_exceptions, **kwargs
+            )
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        configs = get_config_list(config, len(inputs))
+        runs = [
+            self._start_run(input_item, item_config, **kwargs)[1:3]
+            for input_item, item_config in zip(inputs, configs)
+        ]
+        results = run_in_process_pool(
+            self.func,
+            inputs,
+            kwargs,
+            workers=self.workers,
+            chunksize=self.chunksize,
+        )
+        outputs = []
+        first_error = None
+        for (callback_manager, run_id), (ok, value) in zip(runs, results):
+            if ok:
+                self._on_end(callback_manager, value, run_id, **kwargs)
+            else:
+                self._on_error(callback_manager, value, run_id, **kwargs)
+                if first_error is None:
+                    first_error = value
+            outputs.append(value)
+        if first_error is not None and not return_exceptions:
+            raise first_error
+        return outputs
+
+    def batch_iter(
+        self,
+        inputs,
+        config=None,
+        *,
+        window: int = 16,
+        ordered: bool = True,
+        return_exceptions=False,
+        **kwargs,
+    ):
+        """
+        流式批量调用；进程池模式下按分块提交，最多同时有约 window 个输入在执行
+        :return: 生成器，产出 (输入下标, 输出值) 元组
+        """
+        if self.executor != "process":
+            yield from super().batch_iter(
+                inputs,
+                config,
+                window=window,
+                ordered=ordered,
+                return_exceptions=return_exceptions,
+                **kwargs,
+            )
+            return
+        if window < 1:
+            raise ValueError("window 必须大于等于 1")
+        config = get_config_list(config, 2)[0]
+        workers = self.workers or os.cpu_count() or 1
+        chunksize = self.chunksize or max(1, window // workers)
+        # 输入下标 -> (回调管理器, run_id)
+        runs = {}
+
+        def _submitted_inputs():
+            # 进程池按需读取输入，每个输入被提交时按顺序触发开始回调
+            for index, input_item in enumerate(inputs):
+                runs[index] = self._start_run(input_item, config.copy(), **kwargs)[1:3]
+                yield input_item
+
+        for index, ok, value in iter_process_chunks(
+            self.func,
+            _submitted_inputs(),
+            kwargs,
+            workers=self.workers,
+            chunksize=chunksize,
+            window=max(1, window // chunksize),
+            ordered=ordered,
+        ):
+            callback_manager, run_id = runs.pop(index)
+            if ok:
+                self._on_end(callback_manager, value, run_id, **kwargs)
+            else:
+                self._on_error(callback_manager, value, run_id, **kwargs)
+                if not return_exceptions:
+                    raise value
+            yield index, value
 
-    # 流式调用：直接复用基类的流式封装
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        # 进程池模式在线程中等待进程池的结果，不阻塞事件循环
+        if self.executor != "process":
+            return await super().abatch(
+                inputs, config, return_exceptions=return_exceptions, **kwargs
+            )
+        return await run_in_executor(
+            None,
+            self.batch,
+            inputs,
+            config,
+            return_exceptions=return_exceptions,
+            **kwargs,
+        )
+
+    # 流式调用：生成器函数逐块输出，普通函数复用基类的流式封装
     def stream(self, input, config=None, **kwargs):
         """
         流式调用包装的函数
         :param input: 输入值
+        :param config: 可选的配置字典
         :param kwargs:额外的参数列表
         :return:
         """
-        yield from super().stream(input, config=None, **kwargs)
+        if self._kind != GENERATOR:
+            if self._is_async:
+                raise TypeError(
+                    f"{self.name} 是协程函数，请使用 ainvoke/abatch/astream 调用"
+                )
+            yield from super().stream(input, config=config, **kwargs)
+            return
+        config, callback_manager, run_id, call_kwargs = self._start_run(
+            input, config, **kwargs
+        )
+        final = None
+        try:
+            for chunk in self.func(input, **call_kwargs):
+                yield chunk
+                final = _add_chunks(final, chunk)
+        except Exception as e:
+            self._on_error(callback_manager, e, run_id, **kwargs)
+            raise
+        self._on_end(callback_manager, final, run_id, **kwargs)
+
+    # 异步流式调用：异步生成器逐块输出，同步函数和生成器在线程池中执行
+    async def astream(self, input, config=None, **kwargs):
+        """
+        异步流式调用包装的函数
+        :param input: 输入值
+        :param config: 可选的配置字典
+        :param kwargs: 额外的参数列表
+        :return: 异步生成器
+        """
+        if self._kind == ASYNC:
+            async for chunk in super().astream(input, config=config, **kwargs):
+                yield chunk
+            return
+        if self._kind != ASYNC_GENERATOR:
+            # 同步函数在线程池中逐块执行，不阻塞事件循环
+            async for chunk in _aiter_in_executor(
+                self.stream(input, config=config, **kwargs)
+            ):
+                yield chunk
+            return
+        config, callback_manager, run_id, call_kwargs = self._start_run(
+            input, config, **kwargs
+        )
+        final = None
+        try:
+            async for chunk in self.func(input, **call_kwargs):
+                yield chunk
+                final = _add_chunks(final, chunk)
+        except Exception as e:
+            self._on_error(callback_manager, e, run_id, **kwargs)
+            raise
+        self._on_end(callback_manager, final, run_id, **kwargs)
+
+    # 只有生成器函数是逐块产出的，普通函数的流式输出只是展开返回值
+    def _streams_incrementally(self):
+        return self._kind in (GENERATOR, ASYNC_GENERATOR)
 
     def __repr__(self) -> str:
         """
         返回 RunnableLambda 的字符串表示
         :return:
         """
+        if self.executor == "process":
+            return f"RunnableLambda(func={self.name}, executor='process')"
         return f"RunnableLambda(func={self.name})"
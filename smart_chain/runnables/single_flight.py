@@ -0,0 +1,129 @@
+"""请求合并（single-flight）：相同输入的并发调用共享同一次底层执行"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from .runnable import Runnable
+from .cache import make_cache_key
+from ..config import ensure_config
+
+
+class RunnableSingleFlight(Runnable):
+    """
+    请求合并包装
+
+    同一时刻有多个相同输入的调用在执行时，只有第一个调用（leader）真正执行 bound，
+    其余调用（follower）等待并共享它的结果或异常。执行结束后立即移除记录，
+    之后的调用会重新执行，因此它不是缓存，只合并"正在进行中"的重复请求。
+    """
+
+    _fingerprint_exclude = frozenset({"calls", "executions", "coalesced"})
+
+    def __init__(self, bound, key_func=None):
+        """
+        初始化请求合并包装
+        :param bound: 被包装的可运行对象
+        :param key_func: 自定义键函数，接收 (input, config, **kwargs) 返回可哈希的键，
+                         默认使用输入和 configurable 配置的规范化哈希
+        """
+        self.bound = bound
+        self.key_func = key_func or make_cache_key
+        # 同步调用：键 -> concurrent.futures.Future
+        self._inflight = {}
+        # 异步调用：(事件循环, 键) -> asyncio.Task，不同事件循环的调用互不合并
+        self._async_inflight = {}
+        self._lock = threading.Lock()
+        # 总调用次数、实际执行次数、被合并的调用次数
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def _make_key(self, input, config, kwargs):
+        try:
+            return self.key_func(input, config, **kwargs)
+        except TypeError:
+            # 无法生成键的输入不参与合并
+            return None
+
+    def invoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        key = self._make_key(input, config, kwargs)
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key) if key is not None else None
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.executions += 1
+                leader = True
+                if key is not None:
+                    future = Future()
+                    self._inflight[key] = future
+        if not leader:
+            # 等待 leader 的结果，异常会原样抛出
+            return future.result()
+        if key is None:
+            return self.bound.invoke(input, config, **kwargs)
+        try:
+            output = self.bound.invoke(input, config, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(output)
+            return output
+        finally:
+            # 先移除记录再返回，之后到达的调用会重新执行
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        key = self._make_key(input, config, kwargs)
+        if key is None:
+            with self._lock:
+                self.calls += 1
+                self.executions += 1
+            return await self.bound.ainvoke(input, config, **kwargs)
+        loop = asyncio.get_running_loop()
+        inflight_key = (loop, key)
+        with self._lock:
+            self.calls += 1
+            task = self._async_inflight.get(inflight_key)
+            if task is not None:
+                self.coalesced += 1
+            else:
+                self.executions += 1
+                # 底层执行放在独立的任务中，某个调用方被取消不会影响其他调用方
+                task = loop.create_task(self.bound.ainvoke(input, config, **kwargs))
+                self._async_inflight[inflight_key] = task
+                task.add_done_callback(
+                    lambda _: self._release_async(inflight_key, task)
+                )
+        return await asyncio.shield(task)
+
+    def _release_async(self, inflight_key, task):
+        with self._lock:
+            if self._async_inflight.get(inflight_key) is task:
+                del self._async_inflight[inflight_key]
+        # 所有调用方都已放弃时，任务的异常不会被读取，这里标记为已读取以免输出警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        """
+        返回请求合并的统计信息
+        :return: 包含 calls、executions、coalesced、in_flight 的字典
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight) + len(self._async_inflight),
+            }
+
+    def __repr__(self):
+        return f"RunnableSingleFlight(bound={self.bound!r})"